@@ -1,33 +1,184 @@
+import functools
+import json
 import os
 import subprocess
+import sys
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+import torch
 import whisper
+from faster_whisper import WhisperModel
+
+WHISPER_BACKENDS = ("faster-whisper", "openai")
+
+# Where Whisper weights are downloaded to and loaded from. Point CLIPIFY_MODEL_CACHE at a persistent
+# volume in containers so restarts don't re-download them; unset, each library's default cache is used.
+MODEL_CACHE_DIR = os.environ.get("CLIPIFY_MODEL_CACHE") or None
+
+# faster-whisper's Silero VAD pre-filter drops stretches of silence longer than this before decoding
+VAD_PARAMETERS = {"min_silence_duration_ms": 500}
+
+# Chunked transcription moves each cut back to the quietest 20 ms frame within this many
+# seconds before the nominal boundary, so chunks rarely split a word.
+SILENCE_SEARCH_SECONDS = 5.0
+SILENCE_FRAME_SECONDS = 0.02
+# Shortest chunk length accepted for chunked transcription; Whisper decodes 30 s windows, so much
+# shorter chunks only multiply model calls and lose context at every boundary
+MIN_CHUNK_SECONDS = 10.0
+
+@functools.lru_cache(maxsize=2)
+def _get_whisper_model(model_size: str = "base", device: str = "cpu"):
+    """Loads a Whisper model once per (size, device) and reuses it for subsequent transcriptions."""
+    return whisper.load_model(model_size, device=device, download_root=MODEL_CACHE_DIR)
+
+@functools.lru_cache(maxsize=2)
+def _get_faster_whisper_model(model_size: str = "base", device: str = "cpu", compute_type: str = "int8",
+                              cpu_threads: int = 0):
+    """
+    Loads a faster-whisper (CTranslate2) model once per (size, device, compute_type, cpu_threads).
+    cpu_threads=0 lets CTranslate2 pick its default thread count.
+    """
+    return WhisperModel(model_size, device=device, compute_type=compute_type, cpu_threads=cpu_threads,
+                        download_root=MODEL_CACHE_DIR)
+
+def _faster_whisper_result_to_dict(segments, info, on_segment=None) -> dict:
+    """
+    Shapes faster-whisper's segment iterator into the dict structure returned by openai-whisper.
+    on_segment, if given, is called with each segment dict as soon as it has been decoded.
+    """
+    segment_dicts = []
+    for segment in segments:
+        segment_dicts.append({
+            'id': len(segment_dicts),
+            'start': segment.start,
+            'end': segment.end,
+            'text': segment.text,
+            'words': [
+                {'word': w.word, 'start': w.start, 'end': w.end, 'probability': w.probability}
+                for w in (segment.words or [])
+            ]
+        })
+        if on_segment:
+            on_segment(segment_dicts[-1])
+    return {
+        'text': "".join(s['text'] for s in segment_dicts),
+        'segments': segment_dicts,
+        'language': info.language,
+    }
+
+def resolve_device(device: str | None = None) -> str:
+    """Returns device, or 'cuda' when it is None and a GPU is available, else 'cpu'."""
+    if device is None:
+        return "cuda" if torch.cuda.is_available() else "cpu"
+    return device
+
+def resolve_compute_type(device: str, backend: str, compute_type: str | None = None) -> str | None:
+    """
+    Returns the precision faster-whisper runs with on device: compute_type if given, else int8
+    (int8_float16 on CUDA). None for the openai backend, whose precision follows the device alone.
+    """
+    if backend == "openai":
+        return None
+    return compute_type or ("int8_float16" if device.startswith("cuda") else "int8")
+
+def _load_model(model_size: str, device: str, backend: str, compute_type: str | None = None, cpu_threads: int = 0):
+    """Returns the cached model for backend, loading it first if needed."""
+    if backend == "openai":
+        return _get_whisper_model(model_size, device)
+    return _get_faster_whisper_model(model_size, device, resolve_compute_type(device, backend, compute_type), cpu_threads)
+
+def warm_whisper_model(model_size: str = "base", device: str | None = None, backend: str = "faster-whisper",
+                       compute_type: str | None = None) -> bool:
+    """
+    Downloads (if needed) and loads the Whisper model that transcribe_audio_with_whisper would use
+    with the same arguments, e.g. while building a container image. Returns True on success, False on failure.
+    """
+    if backend not in WHISPER_BACKENDS:
+        print(f"Error: Unknown Whisper backend '{backend}'. Expected one of {WHISPER_BACKENDS}.")
+        return False
+    device = resolve_device(device)
+    try:
+        _load_model(model_size, device, backend, compute_type)
+    except Exception as e:
+        print(f"Error loading Whisper model '{model_size}': {e}")
+        return False
+    print(f"Whisper model '{model_size}' ({backend}) is ready on {device}")
+    return True
+
+def _run_whisper(audio, model_size: str, device: str, backend: str, on_segment=None, compute_type: str | None = None,
+                 vad_filter: bool = True, cpu_threads: int = 0) -> dict:
+    """
+    Transcribes a path or 16 kHz float32 array with the chosen backend on the given device.
+    compute_type and vad_filter apply to faster-whisper only; compute_type defaults to int8
+    (int8_float16 on CUDA), and vad_filter skips silence before it reaches the model.
+    on_segment, if given, is called with each segment dict in order; with faster-whisper this
+    happens while decoding is still in progress. cpu_threads caps faster-whisper's CPU threads (0: its default).
+    """
+    model = _load_model(model_size, device, backend, compute_type, cpu_threads)
+    if backend == "openai":
+        result = model.transcribe(audio, word_timestamps=True, fp16=device.startswith("cuda"))
+        if on_segment:
+            for segment in result.get('segments', []):
+                on_segment(segment)
+        return result
+    # Greedy decoding, as openai-whisper's transcribe does by default (faster-whisper defaults to 5 beams)
+    segments, info = model.transcribe(audio, word_timestamps=True, beam_size=1, vad_filter=vad_filter,
+                                      vad_parameters=VAD_PARAMETERS if vad_filter else None)
+    return _faster_whisper_result_to_dict(segments, info, on_segment)
+
+def _write_segment_jsonl(jsonl_file, segment: dict):
+    """Appends one segment to an open JSONL transcript and flushes it so readers see it immediately."""
+    jsonl_file.write(json.dumps({key: segment[key] for key in ('id', 'start', 'end', 'text') if key in segment}) + "\n")
+    jsonl_file.flush()
+
+def write_transcript_jsonl(segments: list, output_path: str) -> str | None:
+    """
+    Writes transcription segments to output_path as JSON Lines, one {'id', 'start', 'end', 'text'}
+    object per line. Returns output_path on success, None on failure.
+    """
+    try:
+        with open(output_path, "w", encoding="utf-8") as jsonl_file:
+            for segment in segments:
+                _write_segment_jsonl(jsonl_file, segment)
+    except OSError as e:
+        print(f"Error writing transcript to {output_path}: {e}")
+        return None
+    return output_path
 
 def extract_audio_from_video(video_file_path: str, output_audio_path: str) -> str:
     """
-    Extracts audio from a video file and saves it to the specified output_audio_path.
+    Extracts audio from a video file and saves it to the specified output_audio_path
+    as a 16 kHz mono PCM .wav, ready for Whisper without further resampling.
     Returns the output_audio_path on success, None on failure.
     """
 
     output_dir = os.path.dirname(output_audio_path)
-    if output_dir and not os.path.exists(output_dir):
+    if output_dir:
         os.makedirs(output_dir, exist_ok=True)
 
-    # Properly escape file paths for the ffmpeg command
-    escaped_video_file = video_file_path.replace('"', '\\"')
-    escaped_audio_file = output_audio_path.replace('"', '\\"')
-
     # Ensure the output is a .wav file as Whisper typically expects that
     if not output_audio_path.lower().endswith(".wav"):
         print(f"Warning: Output audio path '{output_audio_path}' is not a .wav file. Forcing .wav for compatibility.")
         # You might want to raise an error or adjust the path more robustly
         output_audio_path = os.path.splitext(output_audio_path)[0] + ".wav"
-        escaped_audio_file = output_audio_path.replace('"', '\\"')
 
-    command = f'ffmpeg -i "{escaped_video_file}" -ab 160k -ac 2 -ar 44100 -vn "{escaped_audio_file}" -y'
+    # Passed as an argv list (no shell), so paths with spaces, quotes or '$' need no escaping.
+    # Written as 16 kHz mono 16-bit PCM, the format Whisper resamples everything to anyway.
+    command = [
+        'ffmpeg',
+        '-i', video_file_path,
+        '-vn',
+        '-ac', '1',
+        '-ar', '16000',
+        '-c:a', 'pcm_s16le',
+        output_audio_path,
+        '-y'
+    ]
 
-    print(f"Executing audio extraction command: {command}")
+    command_str = " ".join(f'"{c}"' if " " in c else c for c in command) # For printing
+    print(f"Executing audio extraction command: {command_str}")
     try:
-        process = subprocess.run(command, shell=True, check=True, capture_output=True, text=True)
+        process = subprocess.run(command, check=True, capture_output=True, text=True)
         print(f"Audio extracted successfully: {output_audio_path}")
         return output_audio_path
     except subprocess.CalledProcessError as e:
@@ -36,15 +187,238 @@ def extract_audio_from_video(video_file_path: str, output_audio_path: str) -> st
         print(f"ffmpeg stderr: {e.stderr}")
         return None
 
-def transcribe_audio_with_whisper(audio_file):
-    """Transcribes an audio file using Whisper."""
-    if not os.path.exists(audio_file):
+def load_audio_from_video(video_file_path: str, sample_rate: int = 16000) -> np.ndarray | None:
+    """
+    Decodes the audio track of a video straight into memory as mono float32 PCM at sample_rate,
+    the format Whisper consumes, by reading ffmpeg's stdout instead of writing a .wav to disk.
+    Returns the samples as a NumPy array on success, None on failure.
+    """
+    if not os.path.exists(video_file_path):
+        print(f"Error: Input video file not found: {video_file_path}")
+        return None
+
+    command = [
+        'ffmpeg',
+        '-nostdin',
+        '-i', video_file_path,
+        '-vn',
+        '-f', 's16le',
+        '-ac', '1',
+        '-ar', str(sample_rate),
+        '-' # Write raw PCM to stdout
+    ]
+
+    print(f"Decoding audio from {video_file_path} at {sample_rate} Hz mono")
+    try:
+        process = subprocess.run(command, check=True, capture_output=True)
+    except subprocess.CalledProcessError as e:
+        print(f"Error executing ffmpeg command for audio decoding: {e}")
+        print(f"ffmpeg stderr: {e.stderr.decode(errors='replace') if e.stderr else ''}")
+        return None
+    return np.frombuffer(process.stdout, np.int16).astype(np.float32) / 32768.0
+
+def load_audio_from_url(url: str, sample_rate: int = 16000) -> np.ndarray | None:
+    """
+    Streams the audio-only format of a video URL from yt-dlp straight into ffmpeg and decodes it into
+    memory like load_audio_from_video, so transcription does not have to wait for the full video download.
+    Returns the samples as a NumPy array on success, None on failure.
+    """
+    # yt-dlp writes the media to stdout ('-o -'); its progress and errors go to the console
+    download_command = [sys.executable, '-m', 'yt_dlp', '--quiet', '--no-warnings', '-f', 'bestaudio/best', '-o', '-', url]
+    decode_command = [
+        'ffmpeg',
+        '-i', 'pipe:0',
+        '-vn',
+        '-f', 's16le',
+        '-ac', '1',
+        '-ar', str(sample_rate),
+        '-'
+    ]
+
+    print(f"Streaming audio from {url} at {sample_rate} Hz mono")
+    try:
+        downloader = subprocess.Popen(download_command, stdout=subprocess.PIPE)
+        try:
+            decoder = subprocess.Popen(decode_command, stdin=downloader.stdout, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+        except OSError:
+            downloader.kill()
+            raise
+    except OSError as e:
+        print(f"Error starting audio streaming for {url}: {e}")
+        return None
+    downloader.stdout.close() # Only ffmpeg reads it; lets yt-dlp see a broken pipe if ffmpeg exits early
+    pcm, decode_stderr = decoder.communicate()
+    download_returncode = downloader.wait()
+
+    if download_returncode != 0 or decoder.returncode != 0:
+        print(f"Error streaming audio from {url} (yt-dlp exit code {download_returncode}, ffmpeg exit code {decoder.returncode})")
+        print(f"ffmpeg stderr: {decode_stderr.decode(errors='replace') if decode_stderr else ''}")
+        return None
+    return np.frombuffer(pcm, np.int16).astype(np.float32) / 32768.0
+
+def _init_chunk_worker(num_threads: int):
+    """
+    Limits torch's threads so parallel openai-whisper chunk workers don't oversubscribe the CPU.
+    faster-whisper workers get the same limit through cpu_threads when their model is loaded.
+    """
+    torch.set_num_threads(num_threads)
+
+def _silence_cut_points(audio: np.ndarray, chunk_samples: int, sample_rate: int) -> list:
+    """
+    Returns the sample offsets at which to start each chunk. Every cut is placed at the end of
+    the lowest-energy frame in the SILENCE_SEARCH_SECONDS before the nominal boundary (the
+    latest one on ties), so no chunk is longer than chunk_samples.
+    """
+    frame = max(1, int(SILENCE_FRAME_SECONDS * sample_rate))
+    chunk_samples = max(chunk_samples, frame) # Every chunk advances by at least one frame
+    # The search stays within the second half of each chunk; chunks too short for one frame there
+    # are cut at their nominal boundary
+    search_frames = min(int(SILENCE_SEARCH_SECONDS * sample_rate), chunk_samples // 2) // frame
+    cuts = [0]
+    while len(audio) - cuts[-1] > chunk_samples:
+        nominal = cuts[-1] + chunk_samples
+        if search_frames == 0:
+            cuts.append(nominal)
+            continue
+        window = audio[nominal - search_frames * frame:nominal].reshape(search_frames, frame)
+        energy = np.einsum('ij,ij->i', window, window)
+        quietest = search_frames - 1 - int(np.argmin(energy[::-1]))
+        cuts.append(nominal - (search_frames - 1 - quietest) * frame)
+    return cuts
+
+def _transcribe_chunk(audio_chunk, offset_seconds: float, model_size: str, backend: str,
+                      compute_type: str | None = None, vad_filter: bool = True, cpu_threads: int = 0):
+    """
+    Transcribes one chunk of 16 kHz mono audio on CPU and shifts its segment and word
+    timestamps by offset_seconds so they line up with the full recording.
+    """
+    result = _run_whisper(audio_chunk, model_size, "cpu", backend, compute_type=compute_type, vad_filter=vad_filter,
+                          cpu_threads=cpu_threads)
+    for segment in result.get('segments', []):
+        segment['start'] += offset_seconds
+        segment['end'] += offset_seconds
+        for word in segment.get('words', []):
+            word['start'] += offset_seconds
+            word['end'] += offset_seconds
+    return result
+
+def _merge_chunk_results(chunk_results: list) -> dict:
+    """Combines per-chunk Whisper results (in chronological order) into a single result dict."""
+    segments = []
+    for chunk_result in chunk_results:
+        for segment in chunk_result.get('segments', []):
+            segment['id'] = len(segments)
+            segments.append(segment)
+    return {
+        'text': "".join(r.get('text', '') for r in chunk_results),
+        'segments': segments,
+        'language': chunk_results[0].get('language') if chunk_results else None,
+    }
+
+def _transcribe_in_parallel_chunks(audio_file, model_size: str, chunk_seconds: float, max_workers: int | None,
+                                   backend: str, on_segment=None, compute_type: str | None = None,
+                                   vad_filter: bool = True):
+    """
+    Splits the audio into chunks of at most chunk_seconds, cut at quiet points, and transcribes
+    them concurrently in worker processes, each holding its own CPU copy of the model.
+    """
+    audio = audio_file if isinstance(audio_file, np.ndarray) else whisper.load_audio(audio_file)
+    sample_rate = whisper.audio.SAMPLE_RATE
+    cuts = _silence_cut_points(audio, int(chunk_seconds * sample_rate), sample_rate)
+    if len(cuts) == 1:
+        # Nothing to split; skip spawning a worker that would load a second copy of the model
+        return _run_whisper(audio, model_size, "cpu", backend, on_segment, compute_type, vad_filter)
+    chunks = [audio[start:end] for start, end in zip(cuts, cuts[1:] + [len(audio)])]
+    offsets = [start / sample_rate for start in cuts]
+
+    cpu_count = os.cpu_count() or 1
+    workers = max(1, min(max_workers or cpu_count, len(chunks)))
+    print(f"Transcribing {len(chunks)} chunks of up to {chunk_seconds}s with {workers} worker(s).")
+    threads_per_worker = max(1, cpu_count // workers)
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_chunk_worker,
+                             initargs=(threads_per_worker,)) as executor:
+        chunk_results = []
+        segment_count = 0
+        # Results arrive in chunk order, so each chunk's segments can be emitted before later chunks finish
+        for chunk_result in executor.map(_transcribe_chunk, chunks, offsets,
+                                         [model_size] * len(chunks), [backend] * len(chunks),
+                                         [compute_type] * len(chunks), [vad_filter] * len(chunks),
+                                         [threads_per_worker] * len(chunks)):
+            chunk_results.append(chunk_result)
+            if on_segment:
+                for segment in chunk_result.get('segments', []):
+                    segment['id'] = segment_count
+                    segment_count += 1
+                    on_segment(segment)
+    return _merge_chunk_results(chunk_results)
+
+def transcribe_audio_with_whisper(audio_file, model_size: str = "base", device: str | None = None,
+                                  chunk_seconds: float | None = None, max_workers: int | None = None,
+                                  backend: str = "faster-whisper", out_jsonl: str | None = None,
+                                  compute_type: str | None = None, vad_filter: bool = True):
+    """
+    Transcribes an audio file, or an in-memory 16 kHz mono float32 array such as the one
+    returned by load_audio_from_video, using Whisper.
+
+    By default the faster-whisper (CTranslate2) backend is used with int8 weights; pass
+    backend='openai' to use the reference openai-whisper implementation instead. Either way
+    the result has the openai-whisper shape: {'text', 'segments': [{'start', 'end', 'text', 'words'}], ...}.
+
+    Runs on CUDA (fp16 / int8_float16) when a GPU is available (or when device='cuda' is given),
+    otherwise on CPU. If the GPU runs out of memory, transcription is retried on CPU.
+    model_size selects the Whisper checkpoint, e.g. 'tiny' for speed or 'base' for accuracy.
+    compute_type overrides faster-whisper's weight/activation precision (e.g. 'int8', 'float16',
+    'float32'); it is ignored by the openai backend. With faster-whisper, vad_filter (on by default)
+    runs Silero voice activity detection first so long silences are never decoded.
+
+    On CPU, passing chunk_seconds splits long audio into chunks of at most that length and
+    transcribes them in parallel across up to max_workers processes. Cuts are moved to the
+    quietest point shortly before each boundary, so words are rarely split between chunks.
+
+    If out_jsonl is given, segments are also written there as JSON Lines while transcription is
+    still running (see write_transcript_jsonl for the line format), so progress on long audio can be
+    followed and partial transcripts inspected.
+
+    The result also records the 'device' and 'compute_type' the transcript was actually produced
+    with (compute_type is None for the openai backend).
+    """
+    if not isinstance(audio_file, np.ndarray) and not os.path.exists(audio_file):
         print(f"Audio file not found: {audio_file}")
         return None
+    if backend not in WHISPER_BACKENDS:
+        print(f"Error: Unknown Whisper backend '{backend}'. Expected one of {WHISPER_BACKENDS}.")
+        return None
+    device = resolve_device(device)
+    jsonl_file = None
     try:
-        model = whisper.load_model("base")
-        result = model.transcribe(audio_file, word_timestamps=True)
+        if out_jsonl:
+            jsonl_file = open(out_jsonl, "w", encoding="utf-8")
+        on_segment = functools.partial(_write_segment_jsonl, jsonl_file) if jsonl_file else None
+        if chunk_seconds and device == "cpu":
+            result = _transcribe_in_parallel_chunks(audio_file, model_size, chunk_seconds, max_workers, backend,
+                                                    on_segment, compute_type, vad_filter)
+        else:
+            try:
+                result = _run_whisper(audio_file, model_size, device, backend, on_segment, compute_type, vad_filter)
+            except RuntimeError as e:
+                # torch raises OutOfMemoryError; CTranslate2 (faster-whisper) raises a plain RuntimeError
+                # such as "CUDA failed with error out of memory"
+                if device == "cpu" or not (isinstance(e, torch.cuda.OutOfMemoryError) or "out of memory" in str(e).lower()):
+                    raise
+                print(f"CUDA ran out of memory while transcribing with Whisper '{model_size}'. Falling back to CPU.")
+                torch.cuda.empty_cache()
+                if jsonl_file: # Discard segments streamed before the failure; the CPU run starts over
+                    jsonl_file.seek(0)
+                    jsonl_file.truncate()
+                device, compute_type = "cpu", None
+                result = _run_whisper(audio_file, model_size, device, backend, on_segment, vad_filter=vad_filter)
+        # Record what actually ran, which differs from what was requested after a CPU fallback
+        result['device'] = device
+        result['compute_type'] = resolve_compute_type(device, backend, compute_type)
         return result
     except Exception as e:
         print(f"Error during transcription: {e}")
         return None
+    finally:
+        if jsonl_file:
+            jsonl_file.close()
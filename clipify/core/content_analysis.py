@@ -1,7 +1,9 @@
-import spacy
+import functools
+import re
+import numpy as np
 # import nltk # No longer strictly needed for the current version of find_important_segments or its fallback
 # from nltk.tokenize import sent_tokenize # No longer strictly needed
-# from .utils import format_time # format_time is not used
+from .utils import format_time
 
 # NLTK download block removed as sent_tokenize is not currently used.
 # If re-introduced, this would be needed:
@@ -11,75 +13,149 @@ import spacy
 # except nltk.downloader.DownloadError:
 #     nltk.download('punkt')
 
+_WORD_PATTERN = re.compile(r"[a-z0-9']+")
+
+# Common English function words and fillers; words in this set never count towards a segment's score
+STOPWORDS = frozenset("""
+    about above after again against also although among another anything around because been before
+    being below between both could didn doesn doing don down during each either else even every everyone
+    everything from further gonna gotta have having here hers herself himself into itself just kind know
+    like maybe might more most much must myself need never none only other ought ours ourselves over
+    pretty quite rather really right same shall should since some something still such than that thats
+    their theirs them themselves then there therefore these they thing things this those though through
+    thus together under unless until upon very want wanna well were what whatever when where whether
+    which while whom whose will with within without would yeah your yours yourself yourselves
+""".split())
+
+SPACY_BATCH_SIZE = 64
+# With spaCy scoring, only this many candidates per requested segment (ranked by the keyword
+# heuristic) are POS-tagged; the rest are dropped without running the model
+SPACY_CANDIDATES_PER_SEGMENT = 4
+# Coarse POS tags that count towards a segment's spaCy score
+SCORED_POS_TAGS = ("NOUN", "PROPN", "VERB")
+# Scoring only needs POS tags (tagger + attribute_ruler, which maps tags to coarse POS);
+# these components are never loaded
+SPACY_UNUSED_COMPONENTS = ["parser", "ner", "lemmatizer"]
+
+# spaCy takes longer to import than everything else in the default pipeline combined and is only
+# needed for accurate scoring, so it is imported on first use rather than at module level
+
+@functools.lru_cache(maxsize=1)
+def _get_spacy_model(model_name: str = 'en_core_web_sm'):
+    """Loads a spaCy model once; failed loads are not cached, so they are retried on the next call."""
+    import spacy
+    return spacy.load(model_name, exclude=SPACY_UNUSED_COMPONENTS)
+
+@functools.lru_cache(maxsize=1)
+def _scored_pos_lut() -> np.ndarray:
+    """
+    Lookup table indexed by integer POS symbol id (all Universal POS ids are below 128), so the
+    per-token check is a table lookup instead of string comparisons. The last entry is False,
+    so clipping out-of-range ids onto it never counts them.
+    """
+    from spacy.symbols import IDS
+    lut = np.zeros(128, dtype=bool)
+    lut[[IDS[tag] for tag in SCORED_POS_TAGS]] = True
+    return lut
+
 def split_transcript_by_timestamps(transcription_result, interval=60):
-    """Splits a transcript into segments based on timestamps and a given interval."""
-    segments_text_time = []
-    current_segment_texts = []
-    current_segment_start_time = None
-    last_word_end_time = 0
+    """
+    Splits a transcript into segments based on timestamps and a given interval.
 
+    Word timestamps are used where a Whisper segment has them, otherwise segment-level timing.
+    A new chunk starts when the gap since the previous word exceeds interval / 2, or when a word
+    would end more than interval seconds after the current chunk's start.
+
+    Returns a list of dicts with the display range under 'time' (e.g. "0:00 - 0:59"),
+    the numeric 'start'/'end' in seconds, and the joined 'text'.
+    """
     if not transcription_result or 'segments' not in transcription_result:
         return []
+    segments = transcription_result['segments']
 
-    for segment_info in transcription_result['segments']:
-        segment_start_time = segment_info['start']
-        segment_end_time = segment_info['end']
-        segment_text = segment_info['text']
-
-        if current_segment_start_time is None:
-            current_segment_start_time = segment_start_time
-
-        # If the gap between the last word and the current segment start is too large,
-        # or if adding this segment would make the current combined segment too long (hypothetically),
-        # then finalize the current segment and start a new one.
-        # This logic is a bit simplified; actual segment duration is based on word timestamps.
-
-        # Iterate through words for more precise timing if available
+    # Flatten into one timeline of units: words where available, otherwise whole segments
+    unit_starts, unit_ends, unit_texts, is_segment_unit = [], [], [], []
+    for segment_info in segments:
         if 'words' in segment_info:
             for word_info in segment_info['words']:
-                word_start_time = word_info['start']
-                word_end_time = word_info['end']
-                word_text = word_info['text']
-
-                if current_segment_start_time is None: # Should have been set by segment start
-                     current_segment_start_time = word_start_time
-
-                # Check for large gap or if current word extends beyond interval from current_segment_start_time
-                if (word_start_time - last_word_end_time > interval / 2 and last_word_end_time != 0) or \
-                   (word_end_time - current_segment_start_time > interval):
-                    if current_segment_texts:
-                        segments_text_time.append({
-                            "time": f"{format_time(current_segment_start_time)} - {format_time(last_word_end_time)}",
-                            "text": "".join(current_segment_texts)
-                        })
-                        current_segment_texts = []
-                    current_segment_start_time = word_start_time
-
-                current_segment_texts.append(word_text)
-                last_word_end_time = word_end_time
+                unit_starts.append(word_info['start'])
+                unit_ends.append(word_info['end'])
+                # Whisper names the token text 'word'; 'text' is accepted for older result dicts
+                unit_texts.append(word_info['word'] if 'word' in word_info else word_info['text'])
+                is_segment_unit.append(False)
         else: # Fallback to segment-level timing if word timestamps are not available
-            if (segment_start_time - last_word_end_time > interval / 2 and last_word_end_time != 0) or \
-               (segment_end_time - current_segment_start_time > interval):
-                if current_segment_texts: # current_segment_texts might be empty if previous was just one segment
-                    segments_text_time.append({
-                        "time": f"{format_time(current_segment_start_time)} - {format_time(last_word_end_time if last_word_end_time > current_segment_start_time else segment_start_time)}",
-                        "text": "".join(current_segment_texts)
-                    })
-                    current_segment_texts = []
-                current_segment_start_time = segment_start_time
+            unit_starts.append(segment_info['start'])
+            unit_ends.append(segment_info['end'])
+            unit_texts.append(segment_info['text'])
+            is_segment_unit.append(True)
 
-            current_segment_texts.append(segment_text)
-            last_word_end_time = segment_end_time
+    if not unit_texts:
+        return []
 
+    starts = np.asarray(unit_starts, dtype=np.float64)
+    ends = np.asarray(unit_ends, dtype=np.float64)
+    count = len(unit_texts)
+
+    # Gap breaks don't depend on where chunks start, so they are found for all units at once
+    previous_ends = np.concatenate(([0.0], ends[:-1]))
+    gap_breaks = np.flatnonzero((starts - previous_ends > interval / 2) & (previous_ends != 0))
+
+    # Duration breaks depend on the current chunk's start, so jump from break to break
+    spans = []
+    chunk_start_time = float(segments[0]['start'])
+    chunk_first_unit = 0
+    next_unit = 0
+    while True:
+        gap_position = np.searchsorted(gap_breaks, next_unit)
+        next_gap = gap_breaks[gap_position] if gap_position < gap_breaks.size else count
+        too_long = np.flatnonzero(ends[next_unit:next_gap] - chunk_start_time > interval)
+        break_unit = next_unit + too_long[0] if too_long.size else next_gap
+        if break_unit >= count:
+            break
+
+        if break_unit > chunk_first_unit:
+            chunk_end_time = ends[break_unit - 1]
+            if is_segment_unit[break_unit] and chunk_end_time <= chunk_start_time:
+                chunk_end_time = starts[break_unit]
+            spans.append((chunk_start_time, float(chunk_end_time), "".join(unit_texts[chunk_first_unit:break_unit])))
+            chunk_first_unit = break_unit
+        chunk_start_time = float(starts[break_unit])
+        next_unit = break_unit + 1
 
     # Add any remaining text as the last segment
-    if current_segment_texts:
-        segments_text_time.append({
-            "time": f"{format_time(current_segment_start_time)} - {format_time(last_word_end_time)}",
-            "text": "".join(current_segment_texts)
-        })
+    spans.append((chunk_start_time, float(ends[-1]), "".join(unit_texts[chunk_first_unit:])))
+
+    return [
+        {"time": f"{format_time(start)} - {format_time(end)}", "start": start, "end": end, "text": text}
+        for start, end, text in spans
+    ]
 
-    return segments_text_time
+
+def _select_top_segments(starts: np.ndarray, ends: np.ndarray, scores: np.ndarray, num_segments: int,
+                         min_segment_duration: float, eligible: np.ndarray | None = None) -> np.ndarray:
+    """
+    Returns the indices of the num_segments highest-scoring segments that last at least
+    min_segment_duration (and are eligible, if a mask is given), in chronological order.
+    Ties in score keep their original order.
+    """
+    mask = (ends - starts) >= min_segment_duration
+    if eligible is not None:
+        mask &= eligible
+    candidates = np.flatnonzero(mask)
+    if num_segments <= 0 or candidates.size == 0:
+        return candidates[:0]
+
+    top = candidates
+    if candidates.size > num_segments:
+        # Partial selection instead of a full sort: find the K-th largest score in O(n), keep everything
+        # above it, then fill the remaining slots with the earliest segments tied at that score
+        candidate_scores = scores[candidates]
+        kth = candidates.size - num_segments
+        threshold = np.partition(candidate_scores, kth)[kth]
+        above = candidates[candidate_scores > threshold]
+        tied = candidates[candidate_scores == threshold][:num_segments - above.size]
+        top = np.concatenate((above, tied))
+    return top[np.argsort(starts[top], kind='stable')]
 
 
 def _find_important_segments_basic(transcription_segments: list, num_segments: int, min_segment_duration: float) -> list:
@@ -90,54 +166,65 @@ def _find_important_segments_basic(transcription_segments: list, num_segments: i
     if not transcription_segments:
         return []
 
-    valid_segments = []
-    for seg in transcription_segments:
-        duration = seg.get('end', 0.0) - seg.get('start', 0.0)
-        if duration >= min_segment_duration and seg.get('text', '').strip():
-            valid_segments.append({
-                'text': seg['text'].strip(),
-                'start': seg['start'],
-                'end': seg['end'],
-                'duration': duration,
-                'text_length': len(seg['text'].strip())
-            })
-
-    valid_segments.sort(key=lambda x: x['text_length'], reverse=True)
-    selected_segments = valid_segments[:num_segments]
-    selected_segments.sort(key=lambda x: x['start'])
-    return [{'text': s['text'], 'start': s['start'], 'end': s['end']} for s in selected_segments]
-
-
-def find_important_segments(transcription_segments: list, num_segments: int, min_segment_duration: float) -> list:
+    count = len(transcription_segments)
+    texts = [seg.get('text', '').strip() for seg in transcription_segments]
+    starts = np.fromiter((seg.get('start', 0.0) for seg in transcription_segments), dtype=np.float64, count=count)
+    ends = np.fromiter((seg.get('end', 0.0) for seg in transcription_segments), dtype=np.float64, count=count)
+    text_lengths = np.fromiter((len(text) for text in texts), dtype=np.int64, count=count)
+
+    selected = _select_top_segments(starts, ends, text_lengths, num_segments, min_segment_duration,
+                                    eligible=text_lengths > 0)
+    return [
+        {'text': texts[i], 'start': transcription_segments[i]['start'], 'end': transcription_segments[i]['end']}
+        for i in selected
+    ]
+
+
+def _score_text_heuristic(text: str) -> int:
+    """
+    Approximates the spaCy content-word score without a model: counts words longer than
+    three characters that are not common English stopwords.
     """
-    Identifies important segments from Whisper's transcription segments using spaCy for scoring,
-    with a fallback to basic text-length based selection if spaCy model is unavailable.
+    return sum(1 for word in _WORD_PATTERN.findall(text.lower()) if len(word) > 3 and word not in STOPWORDS)
+
+
+def find_important_segments(transcription_segments: list, num_segments: int, min_segment_duration: float,
+                            accurate: bool = False) -> list:
+    """
+    Identifies important segments from Whisper's transcription segments.
+
+    By default segments are scored with a fast stopword-based content-word heuristic. With
+    accurate=True, spaCy POS tagging is used instead (counting nouns, proper nouns and verbs),
+    with a fallback to basic text-length based selection if the spaCy model is unavailable.
 
     Args:
         transcription_segments (list): List of segment dictionaries from Whisper.
         num_segments (int): The desired number of important segments.
         min_segment_duration (float): Minimum duration for a segment to be considered.
+        accurate (bool): Score with spaCy POS tagging instead of the keyword heuristic.
 
     Returns:
         list: A list of dictionaries, each representing an important segment.
     """
-    try:
-        nlp = spacy.load('en_core_web_sm')
-        print("Using spaCy for segment importance scoring.")
-    except OSError:
-        print("spaCy model 'en_core_web_sm' not found. Please run 'python -m spacy download en_core_web_sm'.")
-        print("Falling back to basic segment selection based on text length.")
-        return _find_important_segments_basic(transcription_segments, num_segments, min_segment_duration)
-    except Exception as e: # Catch other potential spacy loading errors
-        print(f"An unexpected error occurred while loading spaCy model: {e}")
-        print("Falling back to basic segment selection based on text length.")
-        return _find_important_segments_basic(transcription_segments, num_segments, min_segment_duration)
+    nlp = None
+    if accurate:
+        try:
+            nlp = _get_spacy_model('en_core_web_sm')
+            print("Using spaCy for segment importance scoring.")
+        except OSError:
+            print("spaCy model 'en_core_web_sm' not found. Please run 'python -m spacy download en_core_web_sm'.")
+            print("Falling back to basic segment selection based on text length.")
+            return _find_important_segments_basic(transcription_segments, num_segments, min_segment_duration)
+        except Exception as e: # Catch other potential spacy loading errors
+            print(f"An unexpected error occurred while loading spaCy model: {e}")
+            print("Falling back to basic segment selection based on text length.")
+            return _find_important_segments_basic(transcription_segments, num_segments, min_segment_duration)
 
 
     if not transcription_segments:
         return []
 
-    scored_segments = []
+    valid_segments = []
     for segment_data in transcription_segments:
         text = segment_data.get('text', '').strip()
         start_time = segment_data.get('start')
@@ -145,36 +232,51 @@ def find_important_segments(transcription_segments: list, num_segments: int, min
 
         if not (text and start_time is not None and end_time is not None):
             continue
-
-        doc = nlp(text)
-        # Score based on number of nouns, proper nouns, and verbs
-        score = len([token for token in doc if token.pos_ in ['NOUN', 'PROPN', 'VERB']])
-
-        scored_segments.append({
-            'text': text,
-            'start': start_time,
-            'end': end_time,
-            'original_score': score,
-            'duration': end_time - start_time
-        })
-
-    # Filter by minimum duration
-    candidate_segments = [
-        seg for seg in scored_segments if seg['duration'] >= min_segment_duration
-    ]
-
-    if not candidate_segments:
-        print("No segments meet the minimum duration criteria after spaCy scoring.")
+        valid_segments.append((text, start_time, end_time))
+
+    count = len(valid_segments)
+    starts = np.fromiter((start_time for _, start_time, _ in valid_segments), dtype=np.float64, count=count)
+    ends = np.fromiter((end_time for _, _, end_time in valid_segments), dtype=np.float64, count=count)
+    # Segments shorter than the minimum can never be selected, so they are dropped before scoring
+    long_enough = np.flatnonzero((ends - starts) >= min_segment_duration)
+    if long_enough.size == 0:
+        print("No segments meet the minimum duration criteria after scoring.")
+        return []
+    valid_segments = [valid_segments[i] for i in long_enough]
+    starts, ends = starts[long_enough], ends[long_enough]
+    count = len(valid_segments)
+
+    # Whisper often repeats the same line (music, silence), so each distinct text is scored only once
+    unique_texts = list(dict.fromkeys(text for text, _, _ in valid_segments))
+    candidate_texts = unique_texts
+    if nlp is not None:
+        from spacy.attrs import POS
+        scored_pos_lut = _scored_pos_lut()
+        # Rough first phase: rank by the cheap keyword heuristic and only tag the leading candidates,
+        # since segments far down that ranking are very unlikely to make the final selection
+        max_candidates = max(num_segments, 0) * SPACY_CANDIDATES_PER_SEGMENT
+        if len(unique_texts) > max_candidates:
+            rough_scores = np.fromiter(map(_score_text_heuristic, unique_texts), dtype=np.int64, count=len(unique_texts))
+            keep = np.sort(np.argsort(-rough_scores, kind='stable')[:max_candidates])
+            candidate_texts = [unique_texts[i] for i in keep]
+        # Stream the candidates through spaCy in batches; only the tagger is needed for POS-based scoring
+        docs = nlp.pipe(candidate_texts, batch_size=SPACY_BATCH_SIZE)
+        # Score based on number of nouns, proper nouns, and verbs: one table lookup per token on each
+        # doc's packed POS array rather than iterating Python token objects
+        unique_scores = (int(np.count_nonzero(scored_pos_lut.take(doc.to_array(POS), mode='clip'))) for doc in docs)
+    else:
+        unique_scores = map(_score_text_heuristic, unique_texts)
+    score_by_text = dict(zip(candidate_texts, unique_scores))
+    # Texts pruned by the first phase are never selected
+    scores = np.fromiter((score_by_text.get(text, 0) for text, _, _ in valid_segments), dtype=np.int64, count=count)
+    eligible = None
+    if len(candidate_texts) < len(unique_texts):
+        eligible = np.fromiter((text in score_by_text for text, _, _ in valid_segments), dtype=bool, count=count)
+
+    selected = _select_top_segments(starts, ends, scores, num_segments, min_segment_duration, eligible=eligible)
+    if selected.size == 0:
+        print("No segments meet the minimum duration criteria after scoring.")
         return []
 
-    # Sort by original_score (descending)
-    candidate_segments.sort(key=lambda x: x['original_score'], reverse=True)
-
-    # Select top num_segments
-    top_segments = candidate_segments[:num_segments]
-
-    # Sort selected segments by start time (chronological order)
-    top_segments.sort(key=lambda x: x['start'])
-
-    # Return only the required keys
-    return [{'text': s['text'], 'start': s['start'], 'end': s['end']} for s in top_segments]
+    # Return only the required keys, in chronological order
+    return [{'text': valid_segments[i][0], 'start': valid_segments[i][1], 'end': valid_segments[i][2]} for i in selected]
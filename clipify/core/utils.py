@@ -1,48 +1,72 @@
+import atexit
+import functools
+import hashlib
+import json
 import os
-import yt_dlp
+import re
+import tempfile
 
 # Note: nltk.tokenize.sent_tokenize was moved to content_analysis.py
 
-def download_youtube_video(url, output_path='Test Videos'):
-    """Downloads a YouTube video."""
+_TIME_PATTERN = re.compile(r"(?:(\d+):)?(\d+):(\d+)")
+_FILENAME_UNSAFE_PATTERN = re.compile(r"[\W_]+") # Runs of anything that isn't a (Unicode) letter or digit
+
+TRANSCRIPT_CACHE_DIR = os.path.join(
+    os.environ.get("XDG_CACHE_HOME") or os.path.join(os.path.expanduser("~"), ".cache"), "clipify", "transcripts"
+)
+
+@functools.lru_cache(maxsize=8)
+def _get_youtube_dl(output_path):
+    """
+    Builds the YoutubeDL used for downloads into output_path once and reuses it afterwards;
+    constructing one loads and compiles every extractor. It is closed when the interpreter exits.
+    """
+    import yt_dlp # Deferred: only needed for URL inputs
     ydl_opts = {
         'format': 'best',
         'outtmpl': os.path.join(output_path, '%(title)s.%(ext)s'),
     }
+    ydl = yt_dlp.YoutubeDL(ydl_opts)
+    atexit.register(ydl.close)
+    return ydl
+
+def download_youtube_video(url, output_path='Test Videos'):
+    """Downloads a YouTube video."""
+    import yt_dlp
     try:
-        with yt_dlp.YoutubeDL(ydl_opts) as ydl:
-            info_dict = ydl.extract_info(url, download=True) # download=True is important
-            if not info_dict: # download=False would require checking info_dict here
-                print(f"yt-dlp failed to extract info for URL: {url}")
-                return None
-            # prepare_filename is typically used with download=False, but with download=True,
-            # it can confirm the file path based on the template.
-            # If download=True, ydl.extract_info itself should return the filename in info_dict.
-            # Let's ensure we get the filename correctly after download.
-            # The 'requested_downloads' key usually holds info about downloaded files.
-            if 'requested_downloads' in info_dict and info_dict['requested_downloads']:
-                 # Get the filepath of the first downloaded file
-                video_file = info_dict['requested_downloads'][0]['filepath']
-            elif 'filename' in info_dict: # Fallback for some cases
-                video_file = info_dict['filename']
-            elif 'title' in info_dict and 'ext' in info_dict : # Construct if absolutely necessary (less reliable)
-                 video_file = ydl.prepare_filename(info_dict) #This might be based on template before download
-                 # ensure it exists if constructed this way
-                 if not os.path.exists(video_file):
-                    print(f"Downloaded video file not found at constructed path: {video_file}")
-                    # Search for it in output_path as a last resort
-                    generated_title_part = info_dict['title'] # A simplified search
-                    possible_files = [f for f in os.listdir(output_path) if generated_title_part in f]
-                    if possible_files:
-                        video_file = os.path.join(output_path, possible_files[0])
-                        print(f"Found video file: {video_file}")
-                    else:
-                        print(f"Still couldn't locate downloaded file for {info_dict['title']}")
-                        return None
+        ydl = _get_youtube_dl(output_path)
+        info_dict = ydl.extract_info(url, download=True) # download=True is important
+        if not info_dict: # download=False would require checking info_dict here
+            print(f"yt-dlp failed to extract info for URL: {url}")
+            return None
+        # prepare_filename is typically used with download=False, but with download=True,
+        # it can confirm the file path based on the template.
+        # If download=True, ydl.extract_info itself should return the filename in info_dict.
+        # Let's ensure we get the filename correctly after download.
+        # The 'requested_downloads' key usually holds info about downloaded files.
+        if 'requested_downloads' in info_dict and info_dict['requested_downloads']:
+             # Get the filepath of the first downloaded file
+            video_file = info_dict['requested_downloads'][0]['filepath']
+        elif 'filename' in info_dict: # Fallback for some cases
+            video_file = info_dict['filename']
+        elif 'title' in info_dict and 'ext' in info_dict : # Construct if absolutely necessary (less reliable)
+             video_file = ydl.prepare_filename(info_dict) #This might be based on template before download
+             # ensure it exists if constructed this way
+             if not os.path.exists(video_file):
+                print(f"Downloaded video file not found at constructed path: {video_file}")
+                # Search for it in output_path as a last resort
+                generated_title_part = info_dict['title'] # A simplified search
+                possible_files = [f for f in os.listdir(output_path) if generated_title_part in f]
+                if possible_files:
+                    video_file = os.path.join(output_path, possible_files[0])
+                    print(f"Found video file: {video_file}")
+                else:
+                    print(f"Still couldn't locate downloaded file for {info_dict['title']}")
+                    return None
 
-            else: # If filename cannot be determined
-                print(f"Could not determine the filename of the downloaded video for URL: {url}")
-                return None
+        else: # If filename cannot be determined
+            print(f"Could not determine the filename of the downloaded video for URL: {url}")
+            return None
 
         if not os.path.exists(video_file):
             print(f"Downloaded video file does not exist: {video_file}")
@@ -66,27 +90,71 @@ def download_youtube_video(url, output_path='Test Videos'):
         print(f"An unexpected error occurred during YouTube download: {e}")
         return None
 
-def format_time(seconds):
-    """Formats time in seconds to MM:SS or HH:MM:SS string."""
-    minutes = int(seconds // 60)
-    seconds = int(seconds % 60)
-    hours = int(minutes // 60)
-    minutes = int(minutes % 60)
-    if hours > 0:
+def sanitize_filename_component(text, max_length=20):
+    """
+    Turns the first max_length characters of text into a filename-safe fragment: letters and
+    digits (including non-ASCII ones) are kept, every other run of characters becomes a single '_'.
+    """
+    return _FILENAME_UNSAFE_PATTERN.sub("_", text[:max_length]).strip("_")
+
+def audio_fingerprint(audio, *settings):
+    """
+    Returns a hex BLAKE2b digest of the decoded audio samples (any contiguous buffer, e.g. a NumPy array)
+    together with the given settings, for use as a transcript cache key.
+    """
+    digest = hashlib.blake2b(audio, digest_size=16)
+    for setting in settings:
+        digest.update(b"\0" + str(setting).encode())
+    return digest.hexdigest()
+
+def load_cached_transcript(fingerprint, cache_dir=TRANSCRIPT_CACHE_DIR):
+    """Returns the transcription result cached under fingerprint, or None if there is none."""
+    cache_path = os.path.join(cache_dir, f"{fingerprint}.json")
+    try:
+        with open(cache_path, encoding="utf-8") as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return None
+    except (OSError, ValueError) as e:
+        print(f"Warning: Ignoring unreadable transcript cache entry {cache_path}: {e}")
+        return None
+
+def save_cached_transcript(fingerprint, transcription_result, cache_dir=TRANSCRIPT_CACHE_DIR):
+    """
+    Stores a transcription result under fingerprint. The entry is written to a temporary file and
+    renamed into place, so concurrent runs never see a partial file.
+    Returns the cache file path on success, None on failure.
+    """
+    cache_path = os.path.join(cache_dir, f"{fingerprint}.json")
+    try:
+        os.makedirs(cache_dir, exist_ok=True)
+        with tempfile.NamedTemporaryFile("w", encoding="utf-8", dir=cache_dir, suffix=".tmp", delete=False) as f:
+            json.dump(transcription_result, f)
+        os.replace(f.name, cache_path)
+    except (OSError, TypeError, ValueError) as e:
+        print(f"Warning: Could not cache transcript at {cache_path}: {e}")
+        return None
+    return cache_path
+
+@functools.lru_cache(maxsize=4096)
+def _format_whole_seconds(total_seconds: int) -> str:
+    hours, remainder = divmod(total_seconds, 3600)
+    minutes, seconds = divmod(remainder, 60)
+    if hours:
         return f"{hours}:{minutes:02d}:{seconds:02d}"
     return f"{minutes}:{seconds:02d}"
 
+def format_time(seconds):
+    """Formats time in seconds to MM:SS or HH:MM:SS string."""
+    return _format_whole_seconds(int(seconds))
+
 def convert_time_to_seconds(time_str):
     """
     Converts a time string in the format HH:MM:SS or MM:SS to seconds.
     Handles cases where the time string may not include hours.
     """
-    parts = time_str.split(':')
-    if len(parts) == 3:  # Includes hours
-        h, m, s = map(int, parts)
-        return h * 3600 + m * 60 + s
-    elif len(parts) == 2:  # Excludes hours
-        m, s = map(int, parts)
-        return m * 60 + s
-    else:
+    match = _TIME_PATTERN.fullmatch(time_str.strip())
+    if match is None:
         raise ValueError("Invalid time format. Expected HH:MM:SS or MM:SS.")
+    h, m, s = match.groups()
+    return int(h or 0) * 3600 + int(m) * 60 + int(s)
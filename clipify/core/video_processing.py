@@ -1,81 +1,141 @@
+import functools
+import json
 import os
-from moviepy.editor import VideoFileClip, TextClip, CompositeVideoClip
-from moviepy.video.fx.all import crop
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
 import subprocess
 # from .utils import convert_time_to_seconds # No longer needed for extract_video_segments directly
 from .utils import format_time # May be useful for logging or consistent naming if desired
 
-def convert_video_aspect_ratio(input_file_path: str, output_file_path: str, target_aspect_ratio_str: str) -> str | None:
-    """
-    Converts a video to a target aspect ratio by cropping and centering.
+# x264 settings shared by every re-encoding step; 'veryfast' is several times quicker than
+# the 'medium' default at a small size cost, and CRF 23 is x264's default quality target
+X264_ENCODE_ARGS = ['-c:v', 'libx264', '-preset', 'veryfast', '-crf', '23']
 
-    Args:
-        input_file_path (str): Path to the input video file.
-        output_file_path (str): Path to save the processed video.
-        target_aspect_ratio_str (str): Target aspect ratio as a string (e.g., '9:16', '1:1').
+# Hardware H.264 encoders in order of preference, with settings comparable to X264_ENCODE_ARGS
+HARDWARE_ENCODE_ARGS = {
+    'h264_nvenc': ['-c:v', 'h264_nvenc', '-preset', 'p4', '-rc', 'vbr', '-cq', '23'],
+    'h264_videotoolbox': ['-c:v', 'h264_videotoolbox', '-q:v', '65'],
+    'h264_qsv': ['-c:v', 'h264_qsv', '-preset', 'veryfast', '-global_quality', '23'],
+}
 
-    Returns:
-        str | None: The output_file_path if successful, else None.
+@functools.lru_cache(maxsize=1)
+def _video_encode_args() -> list:
     """
+    Picks the video encoder arguments for every re-encoding step, once per process: the first
+    hardware H.264 encoder that ffmpeg lists and that can actually encode a test frame, else libx264.
+    ffmpeg builds often list encoders (e.g. NVENC) whose hardware is not present, hence the test encode.
+    """
+    try:
+        encoders = subprocess.run(['ffmpeg', '-hide_banner', '-encoders'], check=True,
+                                  capture_output=True, text=True).stdout
+    except Exception as e:
+        print(f"Could not list ffmpeg encoders, using libx264: {e}")
+        return X264_ENCODE_ARGS
+
+    for encoder, encode_args in HARDWARE_ENCODE_ARGS.items():
+        if encoder not in encoders:
+            continue
+        test_command = [
+            'ffmpeg', '-hide_banner', '-f', 'lavfi', '-i', 'color=size=256x256:duration=0.1',
+            *encode_args, '-f', 'null', '-'
+        ]
+        try:
+            subprocess.run(test_command, check=True, capture_output=True, text=True, timeout=30)
+        except Exception:
+            continue
+        print(f"Using hardware video encoder: {encoder}")
+        return encode_args
+    return X264_ENCODE_ARGS
+
+def _parse_aspect_ratio(target_aspect_ratio_str: str) -> float | None:
+    """Parses an aspect ratio string like '9:16' into width / height, or returns None if it is invalid."""
     try:
         ar_w_str, ar_h_str = target_aspect_ratio_str.split(':')
         ar_w = int(ar_w_str)
         ar_h = int(ar_h_str)
         if ar_w <= 0 or ar_h <= 0:
             raise ValueError("Aspect ratio parts must be positive.")
-        target_ar = ar_w / ar_h
+        return ar_w / ar_h
     except ValueError as e:
         print(f"Error: Invalid target_aspect_ratio_str '{target_aspect_ratio_str}'. Expected format like '9:16'. Details: {e}")
         return None
 
-    if not os.path.exists(input_file_path):
-        print(f"Error: Input file not found at {input_file_path}")
-        return None
+def _crop_dimensions(orig_w: int, orig_h: int, target_ar: float) -> tuple:
+    """Returns the (width, height) of the largest centered crop of orig_w x orig_h with aspect ratio target_ar."""
+    current_ar = orig_w / orig_h
 
-    clip = None
-    cropped_clip = None
-    try:
-        clip = VideoFileClip(input_file_path)
-        orig_w, orig_h = clip.size
+    if current_ar > target_ar:  # Video is wider than target (e.g., 16:9 source to 9:16 target)
+        return int(orig_h * target_ar), orig_h
+    # Video is taller than target or same AR (e.g., 16:9 source to 1:1 target, or 9:16 to 9:16)
+    return orig_w, int(orig_w / target_ar)
 
-        current_ar = orig_w / orig_h
+def _even_crop_dimensions(orig_w: int, orig_h: int, target_ar: float) -> tuple:
+    """Like _crop_dimensions, rounded down to even sizes as required by H.264 with 4:2:0 chroma."""
+    new_width, new_height = _crop_dimensions(orig_w, orig_h, target_ar)
+    return new_width - new_width % 2, new_height - new_height % 2
 
-        if current_ar > target_ar:  # Video is wider than target (e.g., 16:9 source to 9:16 target)
-            new_height = orig_h
-            new_width = int(orig_h * target_ar)
-        else:  # Video is taller than target or same AR (e.g., 16:9 source to 1:1 target, or 9:16 to 9:16)
-            new_width = orig_w
-            new_height = int(orig_w / target_ar)
+def _crop_filter(orig_w: int, orig_h: int, new_width: int, new_height: int) -> str:
+    """Builds an ffmpeg crop filter that centers a new_width x new_height window in the frame."""
+    return f"crop={new_width}:{new_height}:{(orig_w - new_width) // 2}:{(orig_h - new_height) // 2}"
 
-        # Ensure new dimensions are not zero if original dimensions were tiny or target AR extreme
-        if new_width == 0 or new_height == 0:
-            print(f"Error: Calculated new dimensions are zero (w:{new_width}, h:{new_height}). Original: {orig_w}x{orig_h}, Target AR: {target_ar_str}")
-            return None
+def convert_video_aspect_ratio(input_file_path: str, output_file_path: str, target_aspect_ratio_str: str) -> str | None:
+    """
+    Converts a video to a target aspect ratio by cropping and centering, using ffmpeg's crop filter.
+    The video is re-encoded (with a hardware encoder when available, else a fast x264 preset)
+    and the audio stream is copied unchanged.
+
+    Args:
+        input_file_path (str): Path to the input video file.
+        output_file_path (str): Path to save the processed video.
+        target_aspect_ratio_str (str): Target aspect ratio as a string (e.g., '9:16', '1:1').
 
-        cropped_clip = clip.fx(crop, width=new_width, height=new_height, x_center=orig_w / 2, y_center=orig_h / 2)
+    Returns:
+        str | None: The output_file_path if successful, else None.
+    """
+    target_ar = _parse_aspect_ratio(target_aspect_ratio_str)
+    if target_ar is None:
+        return None
 
-        output_dir = os.path.dirname(output_file_path)
-        if output_dir and not os.path.exists(output_dir):
-            os.makedirs(output_dir, exist_ok=True)
+    probe = _probe_video(input_file_path)
+    if probe is None:
+        print(f"Error: Could not open or read the frame size of {input_file_path}")
+        return None
+    orig_w, orig_h, _ = probe
 
-        temp_audio_dir = os.path.dirname(output_file_path) if os.path.dirname(output_file_path) else '.'
-        cropped_clip.write_videofile(
-            output_file_path,
-            codec='libx264',
-            audio_codec='aac',
-            temp_audiofile_path=temp_audio_dir,
-            logger=None # supresses default progress bar, use 'bar' for progress bar
-        )
+    new_width, new_height = _even_crop_dimensions(orig_w, orig_h, target_ar)
+
+    # Ensure new dimensions are not zero if original dimensions were tiny or target AR extreme
+    if new_width == 0 or new_height == 0:
+        print(f"Error: Calculated new dimensions are zero (w:{new_width}, h:{new_height}). Original: {orig_w}x{orig_h}, Target AR: {target_aspect_ratio_str}")
+        return None
+
+    output_dir = os.path.dirname(output_file_path)
+    if output_dir:
+        os.makedirs(output_dir, exist_ok=True)
+
+    # Only the video stream is re-encoded; the audio is copied as-is
+    command = [
+        'ffmpeg',
+        '-nostdin',
+        '-i', input_file_path,
+        '-vf', _crop_filter(orig_w, orig_h, new_width, new_height),
+        *_video_encode_args(),
+        '-c:a', 'copy',
+        '-y',
+        output_file_path
+    ]
+
+    try:
+        subprocess.run(command, check=True, capture_output=True, text=True)
         print(f"Converted '{input_file_path}' to aspect ratio {target_aspect_ratio_str}, saved as '{output_file_path}'")
         return output_file_path
+    except subprocess.CalledProcessError as e:
+        print(f"Error during video aspect ratio conversion for '{input_file_path}': {e}")
+        print(f"ffmpeg stderr: {e.stderr}")
+        return None
     except Exception as e:
         print(f"Error during video aspect ratio conversion for '{input_file_path}': {e}")
         return None
-    finally:
-        if cropped_clip:
-            cropped_clip.close()
-        if clip:
-            clip.close()
 
 def extract_video_segments(video_file_path: str, start_seconds: float, end_seconds: float, output_file_path: str) -> bool:
     """
@@ -88,7 +148,7 @@ def extract_video_segments(video_file_path: str, start_seconds: float, end_secon
         return False
 
     output_dir = os.path.dirname(output_file_path)
-    if output_dir and not os.path.exists(output_dir):
+    if output_dir:
         os.makedirs(output_dir, exist_ok=True)
 
     duration = end_seconds - start_seconds
@@ -96,15 +156,17 @@ def extract_video_segments(video_file_path: str, start_seconds: float, end_secon
         print(f"Error: Segment duration is not positive (start: {start_seconds}, end: {end_seconds}). Skipping extraction.")
         return False
 
-    # ffmpeg command using seconds for -ss (start) and -t (duration) or -to (end time)
-    # Using -to is generally safer with -ss if input -ss is not perfectly accurate for keyframes.
-    # However, -t (duration) is also common. Let's use -to for now.
+    # -ss/-to are given as input options so ffmpeg seeks in the container instead of
+    # demuxing everything before start_seconds. With stream copy the cut snaps to the
+    # keyframe at or before start_seconds; timestamps are shifted to start at zero.
     command = [
         'ffmpeg',
-        '-i', video_file_path,
+        '-nostdin',
         '-ss', str(start_seconds),
         '-to', str(end_seconds),
+        '-i', video_file_path,
         '-c', 'copy', # Copy codecs to avoid re-encoding, much faster
+        '-avoid_negative_ts', 'make_zero',
         '-y', # Overwrite output file if it exists
         output_file_path
     ]
@@ -126,6 +188,26 @@ def extract_video_segments(video_file_path: str, start_seconds: float, end_secon
         return False
 
 
+def extract_video_segments_batch(video_file_path: str, segments: list, max_workers: int = 4) -> list:
+    """
+    Extracts several segments from video_file_path concurrently.
+
+    Args:
+        video_file_path (str): Path to the source video.
+        segments (list): List of (start_seconds, end_seconds, output_file_path) tuples.
+        max_workers (int): Maximum number of ffmpeg processes to run at once. Stream-copy
+            extraction is disk-bound, so a small cap avoids seek thrashing.
+
+    Returns:
+        list: One bool per segment, in input order, True where extraction succeeded.
+    """
+    if not segments:
+        return []
+    # Each worker only waits on its own ffmpeg child process, so threads are enough here
+    with ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(segments)))) as executor:
+        return list(executor.map(lambda seg: extract_video_segments(video_file_path, *seg), segments))
+
+
 def add_captions_to_video(
     video_path: str,
     transcription_segments: list,
@@ -136,30 +218,171 @@ def add_captions_to_video(
     bg_color: str = 'black',
     stroke_color: str = 'black',
     stroke_width: float = 0.5,
-    position: tuple = ('center', 0.85)
-):
+    position: tuple = ('center', 0.85),
+    frame_size: tuple | None = None
+) -> str | None:
     """
     Adds captions to a video based on transcription segments.
 
+    The captions are written to an ASS subtitle file and burned in by ffmpeg's ass filter,
+    so no per-caption images are rendered in Python. Audio is stream-copied.
+
     Args:
         video_path (str): Path to the input video file.
         transcription_segments (list): List of dicts, e.g., [{'text': "Hello", 'start': 0.5, 'end': 2.0}, ...].
         output_path (str): Path to save the video with captions.
-        fontsize (int): Font size for the captions.
+        fontsize (int): Font size for the captions, in output pixels.
         font (str): Font type for the captions.
         color (str): Text color for the captions.
         bg_color (str): Background color for the text. Use 'transparent' for no background.
         stroke_color (str): Color of the text border.
         stroke_width (float): Width of the text border.
         position (tuple): Position of the text (MoviePy format).
+        frame_size (tuple | None): (width, height) of the video if the caller already knows it,
+            e.g. from a previous crop, so the file is not opened again just to read its header.
+
+    Returns:
+        str | None: The output_path if captions were added, else None.
+    """
+    if frame_size is None:
+        probe = _probe_video(video_path)
+        if probe is None:
+            print(f"Error: Could not open or read the frame size of {video_path}")
+            return None
+        frame_size = probe[:2]
+    width, height = frame_size
+
+    with tempfile.TemporaryDirectory() as caption_dir:
+        caption_count = _write_ass_captions(
+            transcription_segments, os.path.join(caption_dir, 'captions.ass'), width, height,
+            fontsize=fontsize, font=font, color=color, bg_color=bg_color,
+            stroke_color=stroke_color, stroke_width=stroke_width, position=position
+        )
+        if not caption_count:
+            print("No valid caption segments found to add. Original video will not be modified.")
+            return None
+
+        output_dir = os.path.dirname(output_path)
+        if output_dir:
+            os.makedirs(output_dir, exist_ok=True)
+
+        command = [
+            'ffmpeg',
+            '-nostdin',
+            '-i', os.path.abspath(video_path),
+            '-vf', 'ass=captions.ass', # Relative to cwd so the path needs no filtergraph escaping
+            *_video_encode_args(),
+            '-c:a', 'copy',
+            '-y',
+            os.path.abspath(output_path)
+        ]
+
+        try:
+            subprocess.run(command, check=True, capture_output=True, text=True, cwd=caption_dir)
+            print(f"Video with captions saved to {output_path}")
+            return output_path
+        except subprocess.CalledProcessError as e:
+            print(f"Error writing video file: {e}")
+            print(f"ffmpeg stderr: {e.stderr}")
+            return None
+        except Exception as e:
+            print(f"Error writing video file: {e}")
+            return None
+
+
+_ASS_COLOR_NAMES = {
+    'white': (255, 255, 255),
+    'black': (0, 0, 0),
+    'yellow': (255, 255, 0),
+    'red': (255, 0, 0),
+    'green': (0, 128, 0),
+    'blue': (0, 0, 255),
+    'gray': (128, 128, 128),
+    'grey': (128, 128, 128),
+}
+
+def _ass_color(color: str) -> str:
+    """Converts a color name or '#RRGGBB' string to an opaque ASS &HAABBGGRR color."""
+    color = color.strip().lower()
+    if color.startswith('#') and len(color) == 7:
+        r, g, b = (int(color[i:i + 2], 16) for i in (1, 3, 5))
+    else:
+        r, g, b = _ASS_COLOR_NAMES.get(color, (255, 255, 255))
+    return f"&H00{b:02X}{g:02X}{r:02X}"
+
+def _ass_timestamp(seconds: float) -> str:
+    """Formats seconds as an ASS H:MM:SS.cc timestamp."""
+    centiseconds = int(round(max(0.0, seconds) * 100))
+    hours, centiseconds = divmod(centiseconds, 360000)
+    minutes, centiseconds = divmod(centiseconds, 6000)
+    secs, centiseconds = divmod(centiseconds, 100)
+    return f"{hours}:{minutes:02d}:{secs:02d}.{centiseconds:02d}"
+
+def _write_ass_captions(
+    transcription_segments: list,
+    ass_path: str,
+    width: int,
+    height: int,
+    fontsize: int = 24,
+    font: str = 'Arial-Bold',
+    color: str = 'white',
+    bg_color: str = 'black',
+    stroke_color: str = 'black',
+    stroke_width: float = 0.5,
+    position: tuple = ('center', 0.85)
+) -> int:
     """
-    if not os.path.exists(video_path):
-        print(f"Error: Video file not found at {video_path}")
-        return
+    Writes transcription segments as an ASS subtitle file styled like the MoviePy captions
+    (font, colors, stroke, background box, position) for burning in with ffmpeg's ass filter.
+    The script resolution matches the video, so fontsize is in output pixels.
 
-    video_clip = VideoFileClip(video_path)
+    Returns:
+        int: The number of caption events written.
+    """
+    # MoviePy font names like 'Arial-Bold' map to a family plus the ASS bold flag
+    font_name, _, font_style = font.partition('-')
+    bold = -1 if 'bold' in font_style.lower() else 0
+
+    # BorderStyle 3 draws an opaque box in OutlineColour; BorderStyle 1 draws a plain outline
+    if bg_color == 'transparent':
+        border_style, outline_color, outline = 1, _ass_color(stroke_color), stroke_width
+    else:
+        border_style, outline_color, outline = 3, _ass_color(bg_color), max(stroke_width, 1)
+
+    x_pos, y_pos = position
+    column = {'left': 1, 'right': 3}.get(x_pos, 2)
+    if isinstance(y_pos, (int, float)):
+        # MoviePy positions the top edge of the caption at this fraction of the frame height
+        alignment, margin_v = 6 + column, int(height * y_pos)
+    elif y_pos == 'top':
+        alignment, margin_v = 6 + column, 0
+    elif y_pos == 'bottom':
+        alignment, margin_v = column, 0
+    else:
+        alignment, margin_v = 3 + column, 0
+    margin_h = int(width * 0.05) # Captions wrap within 90% of the frame width
+
+    lines = [
+        "[Script Info]",
+        "ScriptType: v4.00+",
+        f"PlayResX: {width}",
+        f"PlayResY: {height}",
+        "WrapStyle: 0",
+        "ScaledBorderAndShadow: yes",
+        "",
+        "[V4+ Styles]",
+        "Format: Name, Fontname, Fontsize, PrimaryColour, SecondaryColour, OutlineColour, BackColour, Bold, Italic, "
+        "Underline, StrikeOut, ScaleX, ScaleY, Spacing, Angle, BorderStyle, Outline, Shadow, Alignment, "
+        "MarginL, MarginR, MarginV, Encoding",
+        f"Style: Caption,{font_name},{fontsize},{_ass_color(color)},{_ass_color(color)},{outline_color},"
+        f"{outline_color},{bold},0,0,0,100,100,0,0,{border_style},{outline},0,{alignment},"
+        f"{margin_h},{margin_h},{margin_v},1",
+        "",
+        "[Events]",
+        "Format: Layer, Start, End, Style, Name, MarginL, MarginR, MarginV, Effect, Text",
+    ]
 
-    caption_clips = []
+    event_count = 0
     for segment in transcription_segments:
         text = segment.get('text', '').strip()
         start_time = segment.get('start')
@@ -167,56 +390,149 @@ def add_captions_to_video(
 
         if not (text and start_time is not None and end_time is not None):
             continue
-
-        duration = end_time - start_time
-        if duration <= 0:
+        if end_time - start_time <= 0:
             continue
 
-        text_width = video_clip.w * 0.9
-
-        current_bg_color = 'none' if bg_color == 'transparent' else bg_color
-
-        txt_clip = TextClip(
-            text,
-            fontsize=fontsize,
-            font=font,
-            color=color,
-            bg_color=current_bg_color,
-            stroke_color=stroke_color,
-            stroke_width=stroke_width,
-            method='caption',
-            align='center',
-            size=(text_width, None)
-        )
+        # Braces and backslashes would be parsed as ASS override tags
+        text = text.replace('\\', '/').replace('{', '(').replace('}', ')').replace('\n', '\\N')
+        lines.append(f"Dialogue: 0,{_ass_timestamp(start_time)},{_ass_timestamp(end_time)},Caption,,0,0,0,,{text}")
+        event_count += 1
 
-        txt_clip = txt_clip.set_position(position).set_duration(duration).set_start(start_time)
-        caption_clips.append(txt_clip)
+    with open(ass_path, 'w', encoding='utf-8') as f:
+        f.write("\n".join(lines) + "\n")
+    return event_count
 
-    if not caption_clips:
-        print("No valid caption segments found to add. Original video will not be modified.")
-        video_clip.close()
-        return
+@functools.lru_cache(maxsize=8)
+def _ffprobe_streams(video_file_path: str, mtime_ns: int, size: int) -> tuple:
+    """
+    Runs ffprobe once per file version and returns (width, height, audio_codec) from the stream
+    headers, without decoding anything; audio_codec is None if there is no audio stream. mtime_ns
+    and size are only part of the cache key, so a file replaced at the same path is probed again.
+    Raises on failure, so failed probes are not cached.
+    """
+    command = [
+        'ffprobe', '-v', 'error', '-show_entries', 'stream=codec_type,codec_name,width,height',
+        '-of', 'json', video_file_path
+    ]
+    result = subprocess.run(command, check=True, capture_output=True, text=True)
+    streams = json.loads(result.stdout).get('streams', [])
+    video = next((stream for stream in streams if stream.get('codec_type') == 'video'), None)
+    if not video or not video.get('width') or not video.get('height'):
+        raise ValueError("no video stream with a frame size")
+    audio = next((stream for stream in streams if stream.get('codec_type') == 'audio'), None)
+    return int(video['width']), int(video['height']), audio.get('codec_name') if audio else None
+
+def _probe_video(video_file_path: str) -> tuple | None:
+    """
+    Returns (width, height, audio_codec) of a video, or None if the file is missing or unreadable,
+    so callers need no separate existence check. Cached per path, modification time and size, since
+    every clip of a run is cut from the same source.
+    """
+    try:
+        stat = os.stat(video_file_path)
+        return _ffprobe_streams(os.path.abspath(video_file_path), stat.st_mtime_ns, stat.st_size)
+    except Exception as e:
+        print(f"Could not probe {video_file_path}: {e}")
+        return None
 
-    output_dir = os.path.dirname(output_path)
-    if output_dir and not os.path.exists(output_dir):
-        os.makedirs(output_dir)
+def render_clip(
+    video_file_path: str,
+    start_seconds: float,
+    end_seconds: float,
+    output_file_path: str,
+    target_aspect_ratio_str: str,
+    transcription_segments: list | None = None,
+    fontsize: int = 24,
+    font: str = 'Arial-Bold',
+    color: str = 'white',
+    bg_color: str = 'black',
+    stroke_color: str = 'black',
+    stroke_width: float = 0.5,
+    position: tuple = ('center', 0.85)
+) -> str | None:
+    """
+    Cuts a segment from the source video, crops it to the target aspect ratio and burns in captions
+    in a single ffmpeg pass, so the segment is decoded and encoded only once.
 
-    final_clip = CompositeVideoClip([video_clip] + caption_clips, size=video_clip.size)
+    Args:
+        video_file_path (str): Path to the source video.
+        start_seconds (float): Segment start in the source video.
+        end_seconds (float): Segment end in the source video.
+        output_file_path (str): Path to save the rendered clip.
+        target_aspect_ratio_str (str): Target aspect ratio as a string (e.g., '9:16', '1:1').
+        transcription_segments (list | None): Caption cues with 'start'/'end' relative to start_seconds.
+            No captions are burned in when empty or None.
+        fontsize, font, color, bg_color, stroke_color, stroke_width, position: Caption styling,
+            with the same meaning as in add_captions_to_video.
 
-    temp_audio_dir = os.path.dirname(output_path) if os.path.dirname(output_path) else '.'
+    Returns:
+        str | None: The output_file_path if successful, else None.
+    """
+    target_ar = _parse_aspect_ratio(target_aspect_ratio_str)
+    if target_ar is None:
+        return None
 
-    try:
-        final_clip.write_videofile(
-            output_path,
-            codec='libx264',
-            audio_codec='aac',
-            temp_audiofile_path=temp_audio_dir
-        )
-        print(f"Video with captions saved to {output_path}")
-    except Exception as e:
-        print(f"Error writing video file: {e}")
-    finally:
-        video_clip.close()
-        final_clip.close()
-        for tc in caption_clips:
-            tc.close()
+    duration = end_seconds - start_seconds
+    if duration <= 0:
+        print(f"Error: Segment duration is not positive (start: {start_seconds}, end: {end_seconds}). Skipping render.")
+        return None
+
+    # One probe gives both the frame size for the crop and the audio codec
+    probe = _probe_video(video_file_path)
+    if probe is None:
+        print(f"Error: Could not open or read the frame size of {video_file_path}")
+        return None
+    orig_w, orig_h, source_audio_codec = probe
+
+    new_width, new_height = _even_crop_dimensions(orig_w, orig_h, target_ar)
+    if new_width == 0 or new_height == 0:
+        print(f"Error: Calculated new dimensions are zero (w:{new_width}, h:{new_height}). Original: {orig_w}x{orig_h}, Target AR: {target_aspect_ratio_str}")
+        return None
+    filters = [_crop_filter(orig_w, orig_h, new_width, new_height)]
+
+    output_dir = os.path.dirname(output_file_path)
+    if output_dir:
+        os.makedirs(output_dir, exist_ok=True)
+
+    with tempfile.TemporaryDirectory() as caption_dir:
+        if transcription_segments:
+            caption_count = _write_ass_captions(
+                transcription_segments, os.path.join(caption_dir, 'captions.ass'), new_width, new_height,
+                fontsize=fontsize, font=font, color=color, bg_color=bg_color,
+                stroke_color=stroke_color, stroke_width=stroke_width, position=position
+            )
+            if caption_count:
+                # Referenced relative to cwd so the path needs no filtergraph escaping
+                filters.append("ass=captions.ass")
+
+        # AAC audio (the usual case for MP4 sources) is copied: every audio packet decodes on its own,
+        # so the input seek lands within one ~23 ms frame and re-encoding would only add work
+        audio_codec = 'copy' if source_audio_codec == 'aac' else 'aac'
+        command = [
+            'ffmpeg',
+            '-nostdin', # Concurrent ffmpeg processes must not read the terminal
+            '-ss', str(start_seconds), # Input seeking: decoding starts at the nearest keyframe
+            '-t', str(duration),
+            '-i', os.path.abspath(video_file_path),
+            '-vf', ",".join(filters),
+            *_video_encode_args(),
+            '-c:a', audio_codec,
+            '-y',
+            os.path.abspath(output_file_path)
+        ]
+
+        command_str = " ".join(f'"{c}"' if " " in c else c for c in command) # For printing
+        print(f"Executing clip render command: {command_str}")
+        try:
+            subprocess.run(command, check=True, capture_output=True, text=True, cwd=caption_dir)
+        except subprocess.CalledProcessError as e:
+            print(f"Error executing ffmpeg for clip rendering: {e}")
+            print(f"ffmpeg stdout: {e.stdout}")
+            print(f"ffmpeg stderr: {e.stderr}")
+            return None
+        except Exception as e:
+            print(f"An unexpected error occurred during clip rendering: {e}")
+            return None
+
+    print(f"Rendered {start_seconds:.2f}s-{end_seconds:.2f}s at aspect ratio {target_aspect_ratio_str}, saved as {output_file_path}")
+    return output_file_path
@@ -3,8 +3,19 @@ import pytest
 from clipify.core import audio_processing
 import os
 import subprocess # Import for CalledProcessError
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
 from unittest.mock import patch, MagicMock
 
+@pytest.fixture(autouse=True)
+def clear_whisper_model_cache():
+    # The loaded Whisper model is cached at module level; reset it so each test sees its own mock
+    audio_processing._get_whisper_model.cache_clear()
+    audio_processing._get_faster_whisper_model.cache_clear()
+    yield
+    audio_processing._get_whisper_model.cache_clear()
+    audio_processing._get_faster_whisper_model.cache_clear()
+
 @patch('subprocess.run')
 def test_extract_audio_from_video_success(mock_subprocess_run, tmp_path):
     # Simulate a successful subprocess run
@@ -23,15 +34,32 @@ def test_extract_audio_from_video_success(mock_subprocess_run, tmp_path):
     args, kwargs = mock_subprocess_run.call_args
 
     # Basic check of the command structure
-    command_list = args[0] # args[0] is the command list/string based on shell=True/False
-    assert 'ffmpeg' in command_list
-    assert f'"{str(video_file)}"' in command_list # Check for quoted video file
-    assert f'"{str(output_audio_path)}"' in command_list # Check for quoted audio file
+    command_list = args[0] # args[0] is the argv list; no shell is involved
+    assert command_list[0] == 'ffmpeg'
+    assert str(video_file) in command_list # Paths are passed verbatim, without quoting
+    assert str(output_audio_path) in command_list
     assert "-y" in command_list # Check for overwrite flag
-    assert kwargs.get('shell') == True
+    # Audio is written in Whisper's native input format: 16 kHz mono PCM
+    assert command_list[command_list.index('-ac') + 1] == '1'
+    assert command_list[command_list.index('-ar') + 1] == '16000'
+    assert command_list[command_list.index('-c:a') + 1] == 'pcm_s16le'
+    assert not kwargs.get('shell')
     assert kwargs.get('check') == True
 
 
+@patch('subprocess.run')
+def test_extract_audio_from_video_path_with_shell_characters(mock_subprocess_run, tmp_path):
+    mock_subprocess_run.return_value = MagicMock(returncode=0)
+    video_file = tmp_path / 'my "best" $clip.mp4'
+    video_file.touch()
+    output_audio_path = tmp_path / "audio $1.wav"
+
+    result_path = audio_processing.extract_audio_from_video(str(video_file), str(output_audio_path))
+
+    assert result_path == str(output_audio_path)
+    command_list = mock_subprocess_run.call_args.args[0]
+    assert command_list[command_list.index('-i') + 1] == str(video_file)
+
 @patch('subprocess.run')
 def test_extract_audio_from_video_ffmpeg_error(mock_subprocess_run, tmp_path):
     # Simulate an ffmpeg error by raising CalledProcessError
@@ -61,10 +89,11 @@ def test_extract_audio_from_video_forces_wav(mock_subprocess_run, tmp_path):
     assert result_path == str(expected_output_audio_wav) # Should return .wav path
     args, kwargs = mock_subprocess_run.call_args
     command_list = args[0]
-    assert f'"{str(expected_output_audio_wav)}"' in command_list # Command should use .wav
+    assert str(expected_output_audio_wav) in command_list # Command should use .wav
 
+@patch('clipify.core.audio_processing.torch.cuda.is_available', return_value=False)
 @patch('clipify.core.audio_processing.whisper.load_model')
-def test_transcribe_audio_with_whisper_success(mock_load_model, tmp_path):
+def test_transcribe_audio_with_whisper_success(mock_load_model, mock_cuda_available, tmp_path):
     mock_model_instance = MagicMock()
     mock_transcription = {'text': 'Hello world', 'segments': []}
     mock_model_instance.transcribe.return_value = mock_transcription
@@ -74,11 +103,11 @@ def test_transcribe_audio_with_whisper_success(mock_load_model, tmp_path):
     # It's good practice for mock tests that the file exists if the function checks for it
     audio_file.touch()
 
-    result = audio_processing.transcribe_audio_with_whisper(str(audio_file))
+    result = audio_processing.transcribe_audio_with_whisper(str(audio_file), backend="openai")
 
     assert result == mock_transcription
-    mock_load_model.assert_called_once_with("base")
-    mock_model_instance.transcribe.assert_called_once_with(str(audio_file), word_timestamps=True)
+    mock_load_model.assert_called_once_with("base", device="cpu", download_root=None)
+    mock_model_instance.transcribe.assert_called_once_with(str(audio_file), word_timestamps=True, fp16=False)
 
 @patch('clipify.core.audio_processing.whisper.load_model')
 def test_transcribe_audio_with_whisper_file_not_found(mock_load_model, tmp_path):
@@ -90,8 +119,9 @@ def test_transcribe_audio_with_whisper_file_not_found(mock_load_model, tmp_path)
     assert result is None
     mock_load_model.assert_not_called() # Model loading shouldn't be attempted if file is not found
 
+@patch('clipify.core.audio_processing.torch.cuda.is_available', return_value=False)
 @patch('clipify.core.audio_processing.whisper.load_model')
-def test_transcribe_audio_with_whisper_transcription_error(mock_load_model, tmp_path):
+def test_transcribe_audio_with_whisper_transcription_error(mock_load_model, mock_cuda_available, tmp_path):
     mock_model_instance = MagicMock()
     # Simulate an error during the transcribe call
     mock_model_instance.transcribe.side_effect = Exception("Simulated transcription error")
@@ -100,8 +130,364 @@ def test_transcribe_audio_with_whisper_transcription_error(mock_load_model, tmp_
     audio_file = tmp_path / "error_audio.wav"
     audio_file.touch()
 
-    result = audio_processing.transcribe_audio_with_whisper(str(audio_file))
+    result = audio_processing.transcribe_audio_with_whisper(str(audio_file), backend="openai")
 
     assert result is None # Expect None on transcription error
-    mock_load_model.assert_called_once_with("base")
-    mock_model_instance.transcribe.assert_called_once_with(str(audio_file), word_timestamps=True)
+    mock_load_model.assert_called_once_with("base", device="cpu", download_root=None)
+    mock_model_instance.transcribe.assert_called_once_with(str(audio_file), word_timestamps=True, fp16=False)
+
+@patch('clipify.core.audio_processing.torch.cuda.is_available', return_value=False)
+@patch('clipify.core.audio_processing.whisper.load_model')
+def test_transcribe_audio_with_whisper_reuses_loaded_model(mock_load_model, mock_cuda_available, tmp_path):
+    mock_model_instance = MagicMock()
+    mock_model_instance.transcribe.return_value = {'text': 'Hello', 'segments': []}
+    mock_load_model.return_value = mock_model_instance
+
+    audio_file = tmp_path / "dummy_audio.wav"
+    audio_file.touch()
+
+    audio_processing.transcribe_audio_with_whisper(str(audio_file), backend="openai")
+    audio_processing.transcribe_audio_with_whisper(str(audio_file), backend="openai")
+
+    mock_load_model.assert_called_once_with("base", device="cpu", download_root=None) # Weights are loaded only once
+    assert mock_model_instance.transcribe.call_count == 2
+
+@patch('clipify.core.audio_processing.torch.cuda.is_available', return_value=True)
+@patch('clipify.core.audio_processing.whisper.load_model')
+def test_transcribe_audio_with_whisper_uses_cuda_fp16(mock_load_model, mock_cuda_available, tmp_path):
+    mock_model_instance = MagicMock()
+    mock_model_instance.transcribe.return_value = {'text': 'Hello', 'segments': []}
+    mock_load_model.return_value = mock_model_instance
+
+    audio_file = tmp_path / "dummy_audio.wav"
+    audio_file.touch()
+
+    audio_processing.transcribe_audio_with_whisper(str(audio_file), model_size="tiny", backend="openai")
+
+    mock_load_model.assert_called_once_with("tiny", device="cuda", download_root=None)
+    mock_model_instance.transcribe.assert_called_once_with(str(audio_file), word_timestamps=True, fp16=True)
+
+@patch('clipify.core.audio_processing.torch.cuda.empty_cache')
+@patch('clipify.core.audio_processing.whisper.load_model')
+def test_transcribe_audio_with_whisper_cuda_oom_falls_back_to_cpu(mock_load_model, mock_empty_cache, tmp_path):
+    gpu_model = MagicMock()
+    gpu_model.transcribe.side_effect = audio_processing.torch.cuda.OutOfMemoryError("Simulated OOM")
+    cpu_model = MagicMock()
+    cpu_model.transcribe.return_value = {'text': 'Hello', 'segments': []}
+    mock_load_model.side_effect = [gpu_model, cpu_model]
+
+    audio_file = tmp_path / "dummy_audio.wav"
+    audio_file.touch()
+
+    result = audio_processing.transcribe_audio_with_whisper(str(audio_file), device="cuda", backend="openai")
+
+    assert result == {'text': 'Hello', 'segments': [], 'device': 'cpu', 'compute_type': None} # Reports the CPU fallback
+    assert mock_load_model.call_args_list[1].kwargs == {'device': 'cpu', 'download_root': None}
+    cpu_model.transcribe.assert_called_once_with(str(audio_file), word_timestamps=True, fp16=False)
+
+@patch('clipify.core.audio_processing.torch.cuda.empty_cache')
+@patch('clipify.core.audio_processing._run_whisper')
+def test_transcribe_audio_with_whisper_ctranslate2_oom_falls_back_to_cpu(mock_run_whisper, mock_empty_cache):
+    # CTranslate2 reports a CUDA OOM as a plain RuntimeError rather than torch's OutOfMemoryError
+    mock_run_whisper.side_effect = [RuntimeError("CUDA failed with error out of memory"), {'text': 'Hello', 'segments': []}]
+    audio = np.zeros(16000, dtype=np.float32)
+
+    result = audio_processing.transcribe_audio_with_whisper(audio, device="cuda")
+
+    assert result == {'text': 'Hello', 'segments': [], 'device': 'cpu', 'compute_type': 'int8'} # Reports the CPU fallback
+    assert mock_run_whisper.call_count == 2
+    assert mock_run_whisper.call_args_list[0].args[2] == "cuda"
+    assert mock_run_whisper.call_args_list[1].args[2] == "cpu"
+    assert mock_run_whisper.call_args_list[1].args[3] == "faster-whisper"
+
+    # Other runtime errors are not retried
+    mock_run_whisper.reset_mock()
+    mock_run_whisper.side_effect = RuntimeError("Unsupported model binary")
+    assert audio_processing.transcribe_audio_with_whisper(audio, device="cuda") is None
+    mock_run_whisper.assert_called_once()
+
+@patch('clipify.core.audio_processing.torch.cuda.is_available')
+def test_resolve_device_and_compute_type(mock_cuda_available):
+    mock_cuda_available.return_value = True
+    assert audio_processing.resolve_device() == "cuda"
+    mock_cuda_available.return_value = False
+    assert audio_processing.resolve_device() == "cpu"
+    assert audio_processing.resolve_device("cuda") == "cuda" # An explicit device is kept
+
+    assert audio_processing.resolve_compute_type("cpu", "faster-whisper") == "int8"
+    assert audio_processing.resolve_compute_type("cuda", "faster-whisper") == "int8_float16"
+    assert audio_processing.resolve_compute_type("cuda", "faster-whisper", "float16") == "float16"
+    assert audio_processing.resolve_compute_type("cuda", "openai", "float16") is None
+
+@patch('clipify.core.audio_processing.whisper.load_model')
+def test_transcribe_chunk_offsets_timestamps(mock_load_model):
+    mock_model_instance = MagicMock()
+    mock_model_instance.transcribe.return_value = {
+        'text': ' Hi there',
+        'segments': [{'id': 0, 'start': 1.0, 'end': 2.5, 'text': ' Hi there',
+                      'words': [{'word': ' Hi', 'start': 1.0, 'end': 1.5}]}]
+    }
+    mock_load_model.return_value = mock_model_instance
+
+    result = audio_processing._transcribe_chunk("chunk-audio", 60.0, "base", "openai")
+
+    mock_load_model.assert_called_once_with("base", device="cpu", download_root=None)
+    assert result['segments'][0]['start'] == 61.0
+    assert result['segments'][0]['end'] == 62.5
+    assert result['segments'][0]['words'][0]['start'] == 61.0
+    assert result['segments'][0]['words'][0]['end'] == 61.5
+
+def test_merge_chunk_results_renumbers_segments():
+    chunk_results = [
+        {'text': ' One', 'language': 'en', 'segments': [{'id': 0, 'start': 0.0, 'end': 1.0, 'text': ' One'}]},
+        {'text': ' Two', 'language': 'en', 'segments': [{'id': 0, 'start': 30.0, 'end': 31.0, 'text': ' Two'}]},
+    ]
+
+    merged = audio_processing._merge_chunk_results(chunk_results)
+
+    assert merged['text'] == ' One Two'
+    assert merged['language'] == 'en'
+    assert [s['id'] for s in merged['segments']] == [0, 1]
+    assert [s['start'] for s in merged['segments']] == [0.0, 30.0]
+
+def test_silence_cut_points_moves_cuts_to_quiet_frames():
+    sample_rate = 16000
+    audio = np.ones(sample_rate * 25, dtype=np.float32)
+    audio[int(sample_rate * 8.5):int(sample_rate * 8.52)] = 0.0 # A short pause shortly before the 10s boundary
+
+    cuts = audio_processing._silence_cut_points(audio, sample_rate * 10, sample_rate)
+
+    assert cuts[0] == 0
+    assert cuts[1] == int(sample_rate * 8.52)
+    assert cuts[2] == cuts[1] + sample_rate * 10 # No quieter frame in the second window; cut at the boundary
+    assert len(cuts) == 3
+
+def test_silence_cut_points_with_chunks_shorter_than_the_search_window():
+    sample_rate = 16000
+    audio = np.ones(sample_rate, dtype=np.float32)
+
+    # Chunks too short to hold a search frame are cut at their nominal boundaries
+    assert audio_processing._silence_cut_points(audio, 500, sample_rate) == list(range(0, sample_rate, 500))
+    # A chunk length below one frame is raised to one frame instead of cutting backwards or looping forever
+    frame = int(audio_processing.SILENCE_FRAME_SECONDS * sample_rate)
+    assert audio_processing._silence_cut_points(audio, 0, sample_rate) == list(range(0, sample_rate, frame))
+
+@patch('clipify.core.audio_processing.os.cpu_count', return_value=8)
+@patch('clipify.core.audio_processing.ProcessPoolExecutor', ThreadPoolExecutor)
+@patch('clipify.core.audio_processing.WhisperModel')
+def test_parallel_chunks_cap_faster_whisper_threads(mock_whisper_model, mock_cpu_count):
+    mock_model_instance = MagicMock()
+    mock_model_instance.transcribe.side_effect = lambda audio, **kwargs: (iter([]), MagicMock(language='en'))
+    mock_whisper_model.return_value = mock_model_instance
+    audio = np.zeros(16000 * 25, dtype=np.float32)
+
+    with patch('clipify.core.audio_processing._init_chunk_worker'): # Leave torch's thread count alone
+        audio_processing.transcribe_audio_with_whisper(audio, device="cpu", chunk_seconds=10, max_workers=2)
+
+    # 8 cores shared by 2 workers: each CTranslate2 model is created with 4 threads
+    mock_whisper_model.assert_called_once_with("base", device="cpu", compute_type="int8", cpu_threads=4, download_root=None)
+
+@patch('clipify.core.audio_processing.ProcessPoolExecutor', ThreadPoolExecutor)
+@patch('clipify.core.audio_processing.whisper.load_audio')
+@patch('clipify.core.audio_processing.whisper.load_model')
+def test_transcribe_audio_with_whisper_parallel_chunks(mock_load_model, mock_load_audio, tmp_path):
+    sample_rate = audio_processing.whisper.audio.SAMPLE_RATE
+    mock_load_audio.return_value = np.zeros(sample_rate * 25, dtype=np.float32) # 25 seconds of audio
+    mock_model_instance = MagicMock()
+    mock_model_instance.transcribe.side_effect = lambda audio, **kwargs: {
+        'text': ' chunk', 'language': 'en',
+        'segments': [{'id': 0, 'start': 0.0, 'end': len(audio) / sample_rate, 'text': ' chunk', 'words': []}]
+    }
+    mock_load_model.return_value = mock_model_instance
+
+    audio_file = tmp_path / "long_audio.wav"
+    audio_file.touch()
+
+    result = audio_processing.transcribe_audio_with_whisper(str(audio_file), device="cpu", chunk_seconds=10, max_workers=2, backend="openai")
+
+    assert result['text'] == ' chunk chunk chunk'
+    assert [(s['start'], s['end']) for s in result['segments']] == [(0.0, 10.0), (10.0, 20.0), (20.0, 25.0)]
+    assert mock_model_instance.transcribe.call_count == 3
+    for call_args in mock_model_instance.transcribe.call_args_list:
+        assert call_args.kwargs == {'word_timestamps': True, 'fp16': False}
+
+@patch('clipify.core.audio_processing.torch.cuda.is_available', return_value=False)
+@patch('clipify.core.audio_processing.WhisperModel')
+def test_transcribe_audio_with_faster_whisper_result_shape(mock_whisper_model, mock_cuda_available, tmp_path):
+    word = MagicMock(word=' Hello', start=0.0, end=0.4, probability=0.9)
+    segment = MagicMock(start=0.0, end=1.0, text=' Hello world', words=[word])
+    mock_model_instance = MagicMock()
+    mock_model_instance.transcribe.return_value = (iter([segment]), MagicMock(language='en'))
+    mock_whisper_model.return_value = mock_model_instance
+
+    audio_file = tmp_path / "dummy_audio.wav"
+    audio_file.touch()
+
+    result = audio_processing.transcribe_audio_with_whisper(str(audio_file))
+
+    mock_whisper_model.assert_called_once_with("base", device="cpu", compute_type="int8", cpu_threads=0, download_root=None)
+    mock_model_instance.transcribe.assert_called_once_with(str(audio_file), word_timestamps=True, beam_size=1, vad_filter=True,
+                                                           vad_parameters={"min_silence_duration_ms": 500})
+    assert result == {
+        'text': ' Hello world',
+        'segments': [{'id': 0, 'start': 0.0, 'end': 1.0, 'text': ' Hello world',
+                      'words': [{'word': ' Hello', 'start': 0.0, 'end': 0.4, 'probability': 0.9}]}],
+        'language': 'en',
+        'device': 'cpu',
+        'compute_type': 'int8',
+    }
+
+@patch('clipify.core.audio_processing.torch.cuda.is_available', return_value=False)
+@patch('clipify.core.audio_processing.WhisperModel')
+def test_transcribe_audio_with_faster_whisper_compute_type_override(mock_whisper_model, mock_cuda_available, tmp_path):
+    mock_whisper_model.return_value.transcribe.return_value = (iter([]), MagicMock(language='en'))
+    audio_file = tmp_path / "dummy_audio.wav"
+    audio_file.touch()
+
+    audio_processing.transcribe_audio_with_whisper(str(audio_file), model_size="small", compute_type="float32")
+
+    mock_whisper_model.assert_called_once_with("small", device="cpu", compute_type="float32", cpu_threads=0, download_root=None)
+
+@patch('clipify.core.audio_processing.torch.cuda.is_available', return_value=False)
+@patch('clipify.core.audio_processing.WhisperModel')
+def test_transcribe_audio_with_faster_whisper_vad_filter_disabled(mock_whisper_model, mock_cuda_available, tmp_path):
+    mock_whisper_model.return_value.transcribe.return_value = (iter([]), MagicMock(language='en'))
+    audio_file = tmp_path / "dummy_audio.wav"
+    audio_file.touch()
+
+    audio_processing.transcribe_audio_with_whisper(str(audio_file), vad_filter=False)
+
+    transcribe_kwargs = mock_whisper_model.return_value.transcribe.call_args.kwargs
+    assert transcribe_kwargs['vad_filter'] is False
+    assert transcribe_kwargs['vad_parameters'] is None
+
+@patch('clipify.core.audio_processing.torch.cuda.is_available', return_value=False)
+@patch('clipify.core.audio_processing.WhisperModel')
+def test_transcribe_audio_with_whisper_streams_jsonl(mock_whisper_model, mock_cuda_available, tmp_path):
+    out_jsonl = tmp_path / "transcript.jsonl"
+    lines_seen_while_decoding = []
+
+    def segments():
+        yield MagicMock(start=0.0, end=1.0, text=' First', words=[])
+        # The first segment is already on disk before the second one is decoded
+        lines_seen_while_decoding.extend(out_jsonl.read_text().splitlines())
+        yield MagicMock(start=1.0, end=2.0, text=' Second', words=[])
+
+    mock_whisper_model.return_value.transcribe.return_value = (segments(), MagicMock(language='en'))
+    audio_file = tmp_path / "dummy_audio.wav"
+    audio_file.touch()
+
+    result = audio_processing.transcribe_audio_with_whisper(str(audio_file), out_jsonl=str(out_jsonl))
+
+    assert result['text'] == ' First Second'
+    assert lines_seen_while_decoding == ['{"id": 0, "start": 0.0, "end": 1.0, "text": " First"}']
+    assert out_jsonl.read_text().splitlines() == [
+        '{"id": 0, "start": 0.0, "end": 1.0, "text": " First"}',
+        '{"id": 1, "start": 1.0, "end": 2.0, "text": " Second"}',
+    ]
+
+@patch('clipify.core.audio_processing.torch.cuda.is_available', return_value=True)
+@patch('clipify.core.audio_processing.WhisperModel')
+def test_transcribe_audio_with_faster_whisper_on_cuda(mock_whisper_model, mock_cuda_available, tmp_path):
+    mock_whisper_model.return_value.transcribe.return_value = (iter([]), MagicMock(language='en'))
+
+    audio_file = tmp_path / "dummy_audio.wav"
+    audio_file.touch()
+
+    result = audio_processing.transcribe_audio_with_whisper(str(audio_file), model_size="tiny")
+
+    mock_whisper_model.assert_called_once_with("tiny", device="cuda", compute_type="int8_float16", cpu_threads=0, download_root=None)
+    assert result['segments'] == []
+
+def test_transcribe_audio_with_whisper_unknown_backend(tmp_path):
+    audio_file = tmp_path / "dummy_audio.wav"
+    audio_file.touch()
+
+    assert audio_processing.transcribe_audio_with_whisper(str(audio_file), backend="bogus") is None
+
+@patch('subprocess.run')
+def test_load_audio_from_video_decodes_pcm(mock_subprocess_run, tmp_path):
+    pcm = np.array([0, 16384, -32768], dtype=np.int16).tobytes()
+    mock_subprocess_run.return_value = MagicMock(returncode=0, stdout=pcm, stderr=b"")
+
+    video_file = tmp_path / "dummy_video.mp4"
+    video_file.touch()
+
+    audio = audio_processing.load_audio_from_video(str(video_file))
+
+    assert audio.dtype == np.float32
+    assert audio.tolist() == [0.0, 0.5, -1.0]
+    command_list = mock_subprocess_run.call_args.args[0]
+    assert command_list[0] == 'ffmpeg'
+    assert str(video_file) in command_list
+    assert command_list[command_list.index('-ac') + 1] == '1'
+    assert command_list[command_list.index('-ar') + 1] == '16000'
+    assert command_list[-1] == '-' # Raw PCM is read from stdout, nothing is written to disk
+
+@patch('subprocess.run')
+def test_load_audio_from_video_ffmpeg_error(mock_subprocess_run, tmp_path):
+    mock_subprocess_run.side_effect = subprocess.CalledProcessError(returncode=1, cmd="ffmpeg", stderr=b"ffmpeg error")
+
+    video_file = tmp_path / "dummy_video.mp4"
+    video_file.touch()
+
+    assert audio_processing.load_audio_from_video(str(video_file)) is None
+
+@patch('clipify.core.audio_processing.MODEL_CACHE_DIR', "/models")
+@patch('clipify.core.audio_processing.torch.cuda.is_available', return_value=False)
+@patch('clipify.core.audio_processing.WhisperModel')
+def test_warm_whisper_model_loads_into_cache_dir(mock_whisper_model, mock_cuda_available):
+    assert audio_processing.warm_whisper_model("small") is True
+    mock_whisper_model.assert_called_once_with("small", device="cpu", compute_type="int8", cpu_threads=0, download_root="/models")
+
+    # A later transcription with the same settings reuses the warmed model
+    mock_whisper_model.return_value.transcribe.return_value = (iter([]), MagicMock(language='en'))
+    audio_processing.transcribe_audio_with_whisper(np.zeros(16000, dtype=np.float32), model_size="small")
+    mock_whisper_model.assert_called_once()
+
+@patch('clipify.core.audio_processing.WhisperModel', side_effect=RuntimeError("Unable to download model"))
+def test_warm_whisper_model_failure(mock_whisper_model):
+    assert audio_processing.warm_whisper_model("base", device="cpu") is False
+
+@patch('subprocess.Popen')
+def test_load_audio_from_url_pipes_yt_dlp_into_ffmpeg(mock_popen):
+    downloader = MagicMock()
+    downloader.wait.return_value = 0
+    decoder = MagicMock(returncode=0)
+    decoder.communicate.return_value = (np.array([16384, -16384], dtype=np.int16).tobytes(), b"")
+    mock_popen.side_effect = [downloader, decoder]
+
+    audio = audio_processing.load_audio_from_url("https://www.youtube.com/watch?v=test")
+
+    assert audio.tolist() == [0.5, -0.5]
+    download_command = mock_popen.call_args_list[0].args[0]
+    decode_command = mock_popen.call_args_list[1].args[0]
+    assert download_command[-1] == "https://www.youtube.com/watch?v=test"
+    assert download_command[download_command.index('-o') + 1] == '-' # Media is streamed, never written to disk
+    assert decode_command[0] == 'ffmpeg'
+    assert decode_command[decode_command.index('-i') + 1] == 'pipe:0'
+    assert mock_popen.call_args_list[1].kwargs['stdin'] is downloader.stdout
+    downloader.stdout.close.assert_called_once()
+
+@patch('subprocess.Popen')
+def test_load_audio_from_url_download_error(mock_popen):
+    downloader = MagicMock()
+    downloader.wait.return_value = 1
+    decoder = MagicMock(returncode=1)
+    decoder.communicate.return_value = (b"", b"pipe:0: Invalid data found when processing input")
+    mock_popen.side_effect = [downloader, decoder]
+
+    assert audio_processing.load_audio_from_url("https://www.youtube.com/watch?v=missing") is None
+
+@patch('clipify.core.audio_processing.torch.cuda.is_available', return_value=False)
+@patch('clipify.core.audio_processing.whisper.load_model')
+def test_transcribe_audio_with_whisper_accepts_array(mock_load_model, mock_cuda_available):
+    mock_model_instance = MagicMock()
+    mock_model_instance.transcribe.return_value = {'text': 'Hello', 'segments': []}
+    mock_load_model.return_value = mock_model_instance
+    audio = np.zeros(16000, dtype=np.float32)
+
+    result = audio_processing.transcribe_audio_with_whisper(audio, backend="openai")
+
+    assert result == {'text': 'Hello', 'segments': [], 'device': 'cpu', 'compute_type': None}
+    assert mock_model_instance.transcribe.call_args.args[0] is audio
@@ -1,12 +1,24 @@
 # tests/test_core/test_content_analysis.py
 import pytest
+import subprocess
+import sys
 from clipify.core import content_analysis
 from unittest.mock import patch, MagicMock
+import numpy as np
+import spacy
+
+@pytest.fixture(autouse=True)
+def clear_spacy_model_cache():
+    # The loaded spaCy model is cached at module level; reset it so each test sees its own mock
+    content_analysis._get_spacy_model.cache_clear()
+    yield
+    content_analysis._get_spacy_model.cache_clear()
 
 # Mock spaCy token for simulating POS tags
 class MockSpacyToken:
     def __init__(self, pos_):
         self.pos_ = pos_
+        self.pos = spacy.symbols.IDS.get(pos_, 0) # Integer POS symbol, as set by spaCy
 
 # Mock spaCy Doc object
 class MockSpacyDoc:
@@ -19,8 +31,12 @@ class MockSpacyDoc:
     def __len__(self): # In case len(doc) is used somewhere, though not in current SUT
         return len(self.tokens)
 
+    def to_array(self, attr): # Like spacy.tokens.Doc.to_array for a single attribute: one uint64 per token
+        assert attr == spacy.attrs.POS
+        return np.array([token.pos for token in self.tokens], dtype=np.uint64)
+
 
-@patch('clipify.core.content_analysis.spacy.load')
+@patch('spacy.load')
 def test_find_important_segments_spacy_path_success(mock_spacy_load, tmp_path):
     mock_nlp = MagicMock()
 
@@ -38,7 +54,7 @@ def test_find_important_segments_spacy_path_success(mock_spacy_load, tmp_path):
              return MockSpacyDoc(['DET', 'NOUN', 'ADJ', 'PROPN']) # Score 2
         return MockSpacyDoc([]) # Default empty doc
 
-    mock_nlp.side_effect = nlp_side_effect
+    mock_nlp.pipe.side_effect = lambda texts, **kwargs: (nlp_side_effect(text) for text in texts)
     mock_spacy_load.return_value = mock_nlp
 
     transcription_segments = [
@@ -52,7 +68,7 @@ def test_find_important_segments_spacy_path_success(mock_spacy_load, tmp_path):
     min_segment_duration = 4.0
 
     selected = content_analysis.find_important_segments(
-        transcription_segments, num_segments_to_select, min_segment_duration
+        transcription_segments, num_segments_to_select, min_segment_duration, accurate=True
     )
 
     assert len(selected) == 2
@@ -67,9 +83,13 @@ def test_find_important_segments_spacy_path_success(mock_spacy_load, tmp_path):
     assert selected[1]['text'] == 'Very important indeed, yes'
     assert selected[1]['start'] == 11.0
 
-    mock_spacy_load.assert_called_once_with('en_core_web_sm')
+    # Components not needed for POS tagging are excluded when the model is loaded
+    mock_spacy_load.assert_called_once_with('en_core_web_sm', exclude=['parser', 'ner', 'lemmatizer'])
+    # All texts are scored in a single batched pass
+    mock_nlp.pipe.assert_called_once()
+    mock_nlp.assert_not_called()
 
-@patch('clipify.core.content_analysis.spacy.load')
+@patch('spacy.load')
 @patch('clipify.core.content_analysis._find_important_segments_basic')
 def test_find_important_segments_spacy_model_not_found_fallback(mock_basic_selector, mock_spacy_load):
     mock_spacy_load.side_effect = OSError("Mocked OSError: Model not found") # Simulate model not found
@@ -82,12 +102,147 @@ def test_find_important_segments_spacy_model_not_found_fallback(mock_basic_selec
     num_segments_input = 1
     min_duration_input = 5.0
 
-    result = content_analysis.find_important_segments(trans_segments_input, num_segments_input, min_duration_input)
+    result = content_analysis.find_important_segments(trans_segments_input, num_segments_input, min_duration_input, accurate=True)
 
-    mock_spacy_load.assert_called_once_with('en_core_web_sm')
+    mock_spacy_load.assert_called_once_with('en_core_web_sm', exclude=['parser', 'ner', 'lemmatizer'])
     mock_basic_selector.assert_called_once_with(trans_segments_input, num_segments_input, min_duration_input)
     assert result == fallback_return_value
 
+@patch('spacy.load')
+def test_find_important_segments_reuses_loaded_spacy_model(mock_spacy_load):
+    mock_nlp = MagicMock()
+    mock_nlp.pipe.side_effect = lambda texts, **kwargs: (MockSpacyDoc(['NOUN']) for _ in texts)
+    mock_spacy_load.return_value = mock_nlp
+
+    segments = [{'text': 'Some segment', 'start': 0.0, 'end': 5.0}]
+    content_analysis.find_important_segments(segments, 1, 1.0, accurate=True)
+    content_analysis.find_important_segments(segments, 1, 1.0, accurate=True)
+
+    mock_spacy_load.assert_called_once_with('en_core_web_sm', exclude=['parser', 'ner', 'lemmatizer'])
+
+@patch('spacy.load')
+def test_find_important_segments_scores_duplicate_texts_once(mock_spacy_load):
+    mock_nlp = MagicMock()
+    piped_texts = []
+    def pipe_side_effect(texts, **kwargs):
+        for text in texts:
+            piped_texts.append(text)
+            yield MockSpacyDoc(['NOUN', 'VERB'] if text == 'Music playing' else ['NOUN'])
+    mock_nlp.pipe.side_effect = pipe_side_effect
+    mock_spacy_load.return_value = mock_nlp
+
+    transcription_segments = [
+        {'text': 'Music playing', 'start': 0.0, 'end': 5.0},
+        {'text': 'Music playing', 'start': 5.0, 'end': 10.0},
+        {'text': 'Something else', 'start': 10.0, 'end': 15.0},
+        {'text': ' Music playing ', 'start': 15.0, 'end': 20.0},
+    ]
+
+    selected = content_analysis.find_important_segments(transcription_segments, 3, 1.0, accurate=True)
+
+    assert piped_texts == ['Music playing', 'Something else']
+    assert [s['start'] for s in selected] == [0.0, 5.0, 15.0] # Duplicates keep the same score
+
+@patch('spacy.load')
+def test_find_important_segments_skips_scoring_short_segments(mock_spacy_load):
+    mock_nlp = MagicMock()
+    piped_texts = []
+    def pipe_side_effect(texts, **kwargs):
+        for text in texts:
+            piped_texts.append(text)
+            yield MockSpacyDoc(['NOUN'])
+    mock_nlp.pipe.side_effect = pipe_side_effect
+    mock_spacy_load.return_value = mock_nlp
+
+    transcription_segments = [
+        {'text': 'Too short', 'start': 0.0, 'end': 0.5},
+        {'text': 'Long enough', 'start': 1.0, 'end': 5.0},
+    ]
+
+    selected = content_analysis.find_important_segments(transcription_segments, 2, 1.0, accurate=True)
+
+    assert piped_texts == ['Long enough'] # Segments under the minimum duration are never tagged
+    assert selected == [{'text': 'Long enough', 'start': 1.0, 'end': 5.0}]
+
+@patch('spacy.load')
+def test_find_important_segments_tags_only_rough_top_candidates(mock_spacy_load):
+    mock_nlp = MagicMock()
+    piped_texts = []
+    def pipe_side_effect(texts, **kwargs):
+        for text in texts:
+            piped_texts.append(text)
+            yield MockSpacyDoc(['NOUN', 'VERB', 'PROPN'] if 'revenue' in text else ['INTJ'])
+    mock_nlp.pipe.side_effect = pipe_side_effect
+    mock_spacy_load.return_value = mock_nlp
+
+    # 1000 distinct filler segments with three content segments spread among them
+    transcription_segments = [{'text': f'um yeah so {i}', 'start': i * 2.0, 'end': i * 2.0 + 1.5} for i in range(1000)]
+    for position in (100, 500, 900):
+        transcription_segments[position]['text'] = f'Quarterly revenue exceeded forecasts {position}'
+    num_segments_to_select = 3
+
+    selected = content_analysis.find_important_segments(transcription_segments, num_segments_to_select, 1.0, accurate=True)
+
+    # Only the heuristic's top 4*k candidates reach spaCy, and the content segments are among them
+    assert len(piped_texts) <= content_analysis.SPACY_CANDIDATES_PER_SEGMENT * num_segments_to_select
+    assert [s['start'] for s in selected] == [200.0, 1000.0, 1800.0]
+
+@patch('spacy.load')
+def test_find_important_segments_heuristic_scoring(mock_spacy_load):
+    transcription_segments = [
+        {'text': 'Um yeah so, like, you know what I mean', 'start': 0.0, 'end': 6.0},          # Score 0 (all stopwords/short)
+        {'text': 'Quarterly revenue doubled after launching product', 'start': 7.0, 'end': 14.0},  # Score 6
+        {'text': 'Engineers rebuilt the pipeline', 'start': 15.0, 'end': 16.0},                # Score 3 (too short)
+        {'text': 'Customers loved the redesigned checkout', 'start': 17.0, 'end': 25.0}         # Score 4
+    ]
+
+    selected = content_analysis.find_important_segments(transcription_segments, 2, 5.0)
+
+    assert [s['text'] for s in selected] == [
+        'Quarterly revenue doubled after launching product',
+        'Customers loved the redesigned checkout'
+    ]
+    mock_spacy_load.assert_not_called() # The heuristic path never loads a spaCy model
+
+def test_score_text_heuristic():
+    assert content_analysis._score_text_heuristic('The president announced a new policy today.') == 4
+    assert content_analysis._score_text_heuristic('yeah, so, like, that was about it') == 0
+    assert content_analysis._score_text_heuristic('') == 0
+
+def test_split_transcript_by_timestamps_word_level():
+    transcription_result = {'segments': [
+        {'start': 0.0, 'end': 4.0, 'text': ' Hello there friend', 'words': [
+            {'word': ' Hello', 'start': 0.0, 'end': 1.0},
+            {'word': ' there', 'start': 1.0, 'end': 2.0},
+            {'word': ' friend', 'start': 2.5, 'end': 4.0},
+        ]},
+        # Gap of 36s > interval / 2 starts a new chunk
+        {'start': 40.0, 'end': 42.0, 'text': ' Next', 'words': [
+            {'word': ' Next', 'start': 40.0, 'end': 42.0},
+        ]},
+    ]}
+
+    chunks = content_analysis.split_transcript_by_timestamps(transcription_result, interval=60)
+
+    assert chunks == [
+        {'time': '0:00 - 0:04', 'start': 0.0, 'end': 4.0, 'text': ' Hello there friend'},
+        {'time': '0:40 - 0:42', 'start': 40.0, 'end': 42.0, 'text': ' Next'},
+    ]
+
+def test_split_transcript_by_timestamps_segment_level():
+    transcription_result = {'segments': [
+        {'start': 0.0, 'end': 30.0, 'text': ' First.'},
+        {'start': 30.0, 'end': 55.0, 'text': ' Second.'},
+        {'start': 55.0, 'end': 70.0, 'text': ' Third.'}, # Would exceed the 60s interval
+    ]}
+
+    chunks = content_analysis.split_transcript_by_timestamps(transcription_result, interval=60)
+
+    assert [c['text'] for c in chunks] == [' First. Second.', ' Third.']
+    assert chunks[0]['time'] == '0:00 - 0:55'
+    assert (chunks[1]['start'], chunks[1]['end']) == (55.0, 70.0)
+    assert content_analysis.split_transcript_by_timestamps({}) == []
+
 def test_find_important_segments_basic_logic_direct():
     """
     Tests the _find_important_segments_basic function directly.
@@ -131,3 +286,30 @@ def test_find_important_segments_basic_logic_direct():
     selected_5 = content_analysis._find_important_segments_basic(segments_input_2, 2, 3.0)
     assert len(selected_5) == 1
     assert selected_5[0]['text'] == 'Segment A meets duration'
+
+def test_select_top_segments_ties_and_mask():
+    starts = np.array([0.0, 10.0, 20.0, 30.0])
+    ends = np.array([8.0, 18.0, 21.0, 38.0])
+    scores = np.array([5, 5, 9, 5])
+
+    # Segment 2 is too short; among the tied scores the earliest segments win
+    selected = content_analysis._select_top_segments(starts, ends, scores, 2, 5.0)
+    assert selected.tolist() == [0, 1]
+
+    eligible = np.array([False, True, True, True])
+    selected = content_analysis._select_top_segments(starts, ends, scores, 2, 5.0, eligible=eligible)
+    assert selected.tolist() == [1, 3]
+
+    assert content_analysis._select_top_segments(starts, ends, scores, 2, 100.0).size == 0
+
+def test_scored_pos_lookup_table():
+    scored = [spacy.symbols.NOUN, spacy.symbols.PROPN, spacy.symbols.VERB]
+    assert np.flatnonzero(content_analysis._scored_pos_lut()).tolist() == sorted(scored)
+    # Ids past the end of the table are clipped onto its last, unscored entry
+    pos_ids = np.array(scored + [spacy.symbols.ADV, 1 << 40], dtype=np.uint64)
+    assert content_analysis._scored_pos_lut().take(pos_ids, mode='clip').tolist() == [True, True, True, False, False]
+
+def test_importing_content_analysis_does_not_import_spacy():
+    # Checked in a fresh interpreter, since this test module itself imports spaCy
+    code = "import sys, clipify.core.content_analysis; assert 'spacy' not in sys.modules"
+    subprocess.run([sys.executable, '-c', code], check=True)
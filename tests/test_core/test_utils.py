@@ -2,15 +2,18 @@
 import pytest
 from clipify.core import utils
 import os
+import subprocess
+import sys
+import yt_dlp
 from unittest.mock import patch, MagicMock
 
 def test_format_time():
     assert utils.format_time(65) == "1:05"
-    assert utils.format_time(3600) == "60:00" # Assuming current logic (MM:SS)
-    assert utils.format_time(3665) == "61:05" # MM:SS
+    assert utils.format_time(3600) == "1:00:00" # HH:MM:SS once an hour is reached
+    assert utils.format_time(3665) == "1:01:05"
     assert utils.format_time(0) == "0:00"
-    # Test case for hours, if format_time is updated to handle HH:MM:SS
-    # assert utils.format_time(3661) == "1:01:01" # If HH:MM:SS format is supported
+    assert utils.format_time(3661) == "1:01:01"
+    assert utils.format_time(59.9) == "0:59" # Fractional seconds are truncated
 
 def test_convert_time_to_seconds():
     assert utils.convert_time_to_seconds("1:05") == 65
@@ -20,10 +23,13 @@ def test_convert_time_to_seconds():
         utils.convert_time_to_seconds("invalid")
     with pytest.raises(ValueError):
         utils.convert_time_to_seconds("1:2:3:4")
+    with pytest.raises(ValueError):
+        utils.convert_time_to_seconds("1:xx")
+    assert utils.convert_time_to_seconds("01:02:03") == 3723
 
 
-@patch('clipify.core.utils.yt_dlp.YoutubeDL')
-def test_download_youtube_video_success(mock_youtube_dl, tmp_path):
+@patch('clipify.core.utils._get_youtube_dl')
+def test_download_youtube_video_success(mock_get_youtube_dl, tmp_path):
     # Create a realistic, though simplified, info_dict that yt-dlp might return
     # after a successful download, specifically the 'requested_downloads' part.
     fake_title = "test_video_title"
@@ -53,7 +59,7 @@ def test_download_youtube_video_success(mock_youtube_dl, tmp_path):
     # We can mock it to return what would be expected if it were used to confirm.
     mock_ydl_instance.prepare_filename.return_value = expected_filename
 
-    mock_youtube_dl.return_value.__enter__.return_value = mock_ydl_instance
+    mock_get_youtube_dl.return_value = mock_ydl_instance
 
     video_url = 'https://www.youtube.com/watch?v=test'
 
@@ -62,42 +68,93 @@ def test_download_youtube_video_success(mock_youtube_dl, tmp_path):
     # For the mock, we ensure our logic correctly extracts the path from info_dict.
     # No need to actually create the file for this unit test if we trust yt-dlp part
     # and only test our path extraction logic from its output.
-    # However, the function itself has an os.path.exists check in some error paths,
-    # so it might be safer to simulate its existence if those paths are tested.
-    # For the success path tested here, it's primarily about getting the path string.
+    # However, the function confirms the file exists before returning its path,
+    # so simulate the file that yt-dlp would have written.
+    open(expected_filename, 'wb').close()
 
     downloaded_path = utils.download_youtube_video(video_url, output_path=str(tmp_path))
 
     assert downloaded_path == expected_filename
-    mock_youtube_dl.assert_called_once() # Check that YoutubeDL was initialized
+    mock_get_youtube_dl.assert_called_once_with(str(tmp_path)) # The shared YoutubeDL for this output path
     # Check extract_info was called correctly
     mock_ydl_instance.extract_info.assert_called_once_with(video_url, download=True)
 
 
-@patch('clipify.core.utils.yt_dlp.YoutubeDL')
-def test_download_youtube_video_download_error(mock_youtube_dl, tmp_path):
+@patch('clipify.core.utils._get_youtube_dl')
+def test_download_youtube_video_download_error(mock_get_youtube_dl, tmp_path):
     mock_ydl_instance = MagicMock()
     # Simulate a download error during extract_info
-    mock_ydl_instance.extract_info.side_effect = utils.yt_dlp.utils.DownloadError("Simulated download error")
-    mock_youtube_dl.return_value.__enter__.return_value = mock_ydl_instance
+    mock_ydl_instance.extract_info.side_effect = yt_dlp.utils.DownloadError("Simulated download error")
+    mock_get_youtube_dl.return_value = mock_ydl_instance
 
     video_url = 'https://www.youtube.com/watch?v=testerror'
     downloaded_path = utils.download_youtube_video(video_url, output_path=str(tmp_path))
 
     assert downloaded_path is None # Expect None on download failure
-    mock_youtube_dl.assert_called_once()
+    mock_get_youtube_dl.assert_called_once_with(str(tmp_path))
     mock_ydl_instance.extract_info.assert_called_once_with(video_url, download=True)
 
-@patch('clipify.core.utils.yt_dlp.YoutubeDL')
-def test_download_youtube_video_no_filepath_in_info(mock_youtube_dl, tmp_path):
+@patch('clipify.core.utils._get_youtube_dl')
+def test_download_youtube_video_no_filepath_in_info(mock_get_youtube_dl, tmp_path):
     mock_ydl_instance = MagicMock()
     # Simulate info_dict missing 'requested_downloads' or 'filepath'
     mock_ydl_instance.extract_info.return_value = {'title': 'test', 'ext': 'mp4'} # Missing file path info
-    mock_youtube_dl.return_value.__enter__.return_value = mock_ydl_instance
+    mock_ydl_instance.prepare_filename.return_value = os.path.join(tmp_path, "test.mp4") # Never written
+    mock_get_youtube_dl.return_value = mock_ydl_instance
 
     video_url = 'https://www.youtube.com/watch?v=testmissingpath'
     downloaded_path = utils.download_youtube_video(video_url, output_path=str(tmp_path))
 
     assert downloaded_path is None # Expect None if path cannot be determined
-    mock_youtube_dl.assert_called_once()
+    mock_get_youtube_dl.assert_called_once_with(str(tmp_path))
     mock_ydl_instance.extract_info.assert_called_once_with(video_url, download=True)
+
+@patch('yt_dlp.YoutubeDL')
+def test_get_youtube_dl_reuses_instance(mock_youtube_dl, tmp_path):
+    utils._get_youtube_dl.cache_clear()
+    try:
+        first = utils._get_youtube_dl(str(tmp_path))
+        second = utils._get_youtube_dl(str(tmp_path))
+
+        assert first is second
+        mock_youtube_dl.assert_called_once() # Extractors are loaded only once per output path
+        assert mock_youtube_dl.call_args.args[0]['outtmpl'] == os.path.join(str(tmp_path), '%(title)s.%(ext)s')
+    finally:
+        utils._get_youtube_dl.cache_clear()
+
+def test_importing_utils_does_not_import_yt_dlp():
+    # Checked in a fresh interpreter, since this test module itself imports yt_dlp
+    code = "import sys, clipify.core.utils; assert 'yt_dlp' not in sys.modules"
+    subprocess.run([sys.executable, '-c', code], check=True)
+
+def test_sanitize_filename_component():
+    assert utils.sanitize_filename_component(" Hello, world! How are you?") == "Hello_world_How_a"
+    assert utils.sanitize_filename_component("Crème brûlée / 東京 tour") == "Crème_brûlée_東京_to"
+    assert utils.sanitize_filename_component("../../etc/passwd") == "etc_passwd"
+    assert utils.sanitize_filename_component("?!...") == ""
+
+def test_audio_fingerprint_depends_on_audio_and_settings():
+    audio = bytearray(b"\x00\x01" * 100)
+
+    fingerprint = utils.audio_fingerprint(audio, "chunk_seconds=45")
+
+    assert fingerprint == utils.audio_fingerprint(bytes(audio), "chunk_seconds=45")
+    assert fingerprint != utils.audio_fingerprint(audio, "chunk_seconds=None")
+    assert fingerprint != utils.audio_fingerprint(b"\x00\x02" * 100, "chunk_seconds=45")
+
+def test_transcript_cache_round_trip(tmp_path):
+    cache_dir = str(tmp_path / "cache")
+    result = {'text': ' Hello', 'segments': [{'id': 0, 'start': 0.0, 'end': 1.5, 'text': ' Hello', 'words': []}]}
+
+    assert utils.load_cached_transcript("abc123", cache_dir=cache_dir) is None # Miss before anything is stored
+
+    cache_path = utils.save_cached_transcript("abc123", result, cache_dir=cache_dir)
+
+    assert cache_path == os.path.join(cache_dir, "abc123.json")
+    assert utils.load_cached_transcript("abc123", cache_dir=cache_dir) == result
+    assert os.listdir(cache_dir) == ["abc123.json"] # No temporary files left behind
+
+def test_load_cached_transcript_ignores_corrupt_entry(tmp_path):
+    (tmp_path / "abc123.json").write_text("{not json")
+
+    assert utils.load_cached_transcript("abc123", cache_dir=str(tmp_path)) is None
@@ -2,7 +2,14 @@
 import pytest
 from clipify.core import video_processing
 from unittest.mock import patch, MagicMock, call
+import json
 import os
+import subprocess
+
+@pytest.fixture(autouse=True)
+def software_video_encoder(monkeypatch):
+    # Encoder detection shells out to ffmpeg; pin libx264 so tests see only the calls under test
+    monkeypatch.setattr(video_processing, '_video_encode_args', lambda: video_processing.X264_ENCODE_ARGS)
 
 @patch('subprocess.run')
 def test_extract_video_segments_success(mock_subprocess_run, tmp_path):
@@ -26,12 +33,17 @@ def test_extract_video_segments_success(mock_subprocess_run, tmp_path):
     # args[0] is the command list
     command_list = args[0]
     assert command_list[0] == 'ffmpeg'
+    assert '-nostdin' in command_list # Batch extraction runs several ffmpeg processes at once
     assert str(video_file) in command_list
     assert str(output_file) in command_list
     assert '-ss' in command_list
     assert str(start_time) in command_list
     assert '-to' in command_list
     assert str(end_time) in command_list
+    # Seek options come before -i so ffmpeg seeks the input instead of decoding up to the start
+    assert command_list.index('-ss') < command_list.index('-i')
+    assert command_list.index('-to') < command_list.index('-i')
+    assert command_list[command_list.index('-c') + 1] == 'copy'
     assert kwargs.get('check') is True # Ensure it raises an error on non-zero exit
 
 @patch('subprocess.run')
@@ -50,107 +62,319 @@ def test_extract_video_segments_failure(mock_subprocess_run, tmp_path):
     mock_subprocess_run.assert_called_once()
 
 
-@patch('clipify.core.video_processing.VideoFileClip')
-def test_convert_video_aspect_ratio_landscape_to_portrait(mock_vfc, tmp_path):
-    mock_clip_instance = MagicMock()
-    mock_clip_instance.size = (1920, 1080) # Original landscape
-    mock_clip_instance.w = 1920
-    mock_clip_instance.h = 1080
-    # mock_clip_instance.duration = 10.0 # Not strictly needed for this test by current func
+@patch('clipify.core.video_processing.extract_video_segments')
+def test_extract_video_segments_batch(mock_extract, tmp_path):
+    # Second segment fails; results must still line up with the input order
+    mock_extract.side_effect = lambda video, start, end, out: start != 10.0
+    video_file = str(tmp_path / "dummy_video.mp4")
+    segments = [
+        (0.0, 5.0, str(tmp_path / "a.mp4")),
+        (10.0, 15.0, str(tmp_path / "b.mp4")),
+        (20.0, 25.0, str(tmp_path / "c.mp4")),
+    ]
+
+    results = video_processing.extract_video_segments_batch(video_file, segments, max_workers=2)
+
+    assert results == [True, False, True]
+    assert mock_extract.call_count == 3
+    mock_extract.assert_any_call(video_file, 10.0, 15.0, str(tmp_path / "b.mp4"))
+    assert video_processing.extract_video_segments_batch(video_file, []) == []
+
+
+@patch('subprocess.run')
+def test_extract_video_segments_batch_runs_one_ffmpeg_per_segment(mock_subprocess_run, tmp_path):
+    mock_subprocess_run.return_value = MagicMock(returncode=0)
+    video_file = tmp_path / "dummy_video.mp4"
+    video_file.touch()
+    segments = [(start, start + 5.0, str(tmp_path / f"clip_{i}.mp4")) for i, start in enumerate((0.0, 10.0, 20.0, 30.0, 40.0))]
 
-    mock_cropped_clip = MagicMock()
-    # Simulate the chain: clip.fx(...)(crop_params)
-    # The crop function itself is usually from moviepy.video.fx.all.crop
-    # So, if fx is a method that takes (crop_func, **kwargs), then mock_clip_instance.fx.return_value is not needed.
-    # Instead, the crop function is passed to fx.
-    # For this test, let's assume fx applies the crop and returns the new clip.
-    mock_clip_instance.fx.return_value = mock_cropped_clip
+    results = video_processing.extract_video_segments_batch(str(video_file), segments)
 
-    mock_vfc.return_value.__enter__.return_value = mock_clip_instance # If VideoFileClip is used in a context manager
-    mock_vfc.return_value = mock_clip_instance # If used directly
+    assert results == [True] * len(segments)
+    assert mock_subprocess_run.call_count == len(segments)
+    outputs = sorted(call.args[0][-1] for call in mock_subprocess_run.call_args_list)
+    assert outputs == sorted(out for _, _, out in segments)
+
+
+@patch('clipify.core.video_processing._probe_video', return_value=(1920, 1080, None)) # Original landscape
+@patch('subprocess.run')
+def test_convert_video_aspect_ratio_landscape_to_portrait(mock_subprocess_run, mock_probe, tmp_path):
+    mock_subprocess_run.return_value = MagicMock(returncode=0)
 
     input_file = str(tmp_path / "input.mp4")
-    # Create a dummy file for os.path.exists checks within the function
-    with open(input_file, 'w') as f: f.write('dummy video data')
     output_file = str(tmp_path / "output_9_16.mp4")
 
     result_path = video_processing.convert_video_aspect_ratio(input_file, output_file, '9:16')
 
     assert result_path == output_file
-    mock_vfc.assert_called_once_with(input_file)
-
-    # Expected: new_width = 1080 * (9/16) = 607.5 -> int(607.5) = 607. new_height = 1080.
-    # Check that clip.fx was called with crop
-    # The first argument to fx should be the crop function, and then kwargs for crop
-    # This part of mocking is tricky. Let's assume fx is called with crop parameters directly as kwargs for simplicity.
-    # A more accurate mock would involve `from moviepy.video.fx.all import crop` and `mock_clip_instance.fx.assert_called_with(crop, width=..., ...)`
-
-    # Given the structure `cropped_clip = clip.fx(crop, width=new_width, ...)`
-    # We check the call to `fx`
-    actual_call = mock_clip_instance.fx.call_args
-    assert actual_call is not None, "fx method was not called"
-    # First positional arg to fx is the effect (crop function itself, hard to assert by name without importing it here)
-    # We can check the kwargs passed to fx, which are the parameters for crop
-    assert actual_call.kwargs['width'] == 607 # int(1080 * 9/16)
-    assert actual_call.kwargs['height'] == 1080
-    assert actual_call.kwargs['x_center'] == 1920 / 2
-    assert actual_call.kwargs['y_center'] == 1080 / 2
-
-    mock_cropped_clip.write_videofile.assert_called_once_with(output_file, codec='libx264', audio_codec='aac', temp_audiofile_path=str(tmp_path), logger=None)
-
-    # Ensure clips are closed
-    # If VideoFileClip is used as a context manager, close is handled.
-    # If not, direct calls to close() should be asserted.
-    # The refactored code uses try/finally to close clips.
-    mock_clip_instance.close.assert_called_once()
-    mock_cropped_clip.close.assert_called_once()
-
-
-@patch('clipify.core.video_processing.VideoFileClip')
-@patch('clipify.core.video_processing.TextClip')
-@patch('clipify.core.video_processing.CompositeVideoClip')
-def test_add_captions_to_video_success(mock_composite_clip, mock_text_clip, mock_vfc, tmp_path):
-    mock_video_clip_instance = MagicMock(w=1280, h=720, size=(1280,720), duration=10.0)
-    # If VideoFileClip is used in a context manager style by the SUT:
-    # mock_vfc.return_value.__enter__.return_value = mock_video_clip_instance
-    # If it's used directly:
-    mock_vfc.return_value = mock_video_clip_instance
-
-    mock_final_composite_clip = MagicMock()
-    mock_composite_clip.return_value = mock_final_composite_clip
-
-    # Each call to TextClip returns a new mock TextClip instance
-    # To check calls on each, use a list of mocks or side_effect
-    mock_text_instances = [MagicMock(), MagicMock()]
-    mock_text_clip.side_effect = mock_text_instances
+    mock_probe.assert_called_once_with(input_file)
+
+    mock_subprocess_run.assert_called_once()
+    command_list = mock_subprocess_run.call_args.args[0]
+    assert command_list[0] == 'ffmpeg'
+    assert command_list[command_list.index('-i') + 1] == input_file
+    # Expected: new_width = int(1080 * (9/16)) = 607, rounded down to an even 606. new_height = 1080.
+    # Centered: x = (1920 - 606) // 2 = 657, y = 0
+    assert command_list[command_list.index('-vf') + 1] == "crop=606:1080:657:0"
+    assert command_list[command_list.index('-c:v') + 1] == 'libx264'
+    assert command_list[command_list.index('-preset') + 1] == 'veryfast'
+    assert command_list[command_list.index('-c:a') + 1] == 'copy' # Audio is not re-encoded
+    assert command_list[-1] == output_file
+
+
+@patch('clipify.core.video_processing._probe_video', return_value=(1920, 1080, None))
+@patch('subprocess.run')
+def test_convert_video_aspect_ratio_errors(mock_subprocess_run, mock_probe, tmp_path):
+    input_file = str(tmp_path / "input.mp4")
+    output_file = str(tmp_path / "output.mp4")
+
+    assert video_processing.convert_video_aspect_ratio(input_file, output_file, '9-16') is None
+    mock_subprocess_run.assert_not_called()
+
+    mock_subprocess_run.side_effect = subprocess.CalledProcessError(returncode=1, cmd="ffmpeg", stderr="ffmpeg error")
+    assert video_processing.convert_video_aspect_ratio(input_file, output_file, '9:16') is None
+
+
+@patch('subprocess.run')
+def test_missing_input_is_caught_by_the_frame_size_probe(mock_subprocess_run, tmp_path):
+    mock_subprocess_run.side_effect = subprocess.CalledProcessError(returncode=1, cmd="ffprobe")
+    missing_file = str(tmp_path / "missing.mp4")
+    output_file = str(tmp_path / "output.mp4")
+    segments = [{'text': 'Hello', 'start': 0.0, 'end': 1.0}]
+
+    assert video_processing.convert_video_aspect_ratio(missing_file, output_file, '9:16') is None
+    assert video_processing.add_captions_to_video(missing_file, segments, output_file) is None
+    assert video_processing.render_clip(missing_file, 0.0, 5.0, output_file, '9:16', segments) is None
+    # Caught before ffprobe or ffmpeg were started
+    mock_subprocess_run.assert_not_called()
+
+
+@patch('clipify.core.video_processing._probe_video', return_value=(1280, 720, None))
+@patch('subprocess.run')
+def test_add_captions_to_video_success(mock_subprocess_run, mock_probe, tmp_path):
+    written_captions = []
+    def run_side_effect(command, **kwargs):
+        written_captions.append(open(os.path.join(kwargs['cwd'], 'captions.ass'), encoding='utf-8').read())
+        return MagicMock(returncode=0)
+    mock_subprocess_run.side_effect = run_side_effect
 
     video_path = str(tmp_path / "input.mp4")
-    open(video_path, 'w').write('dummy') # Make file exist for os.path.exists
     output_path = str(tmp_path / "captioned_video.mp4")
     segments = [{'text': 'Hello', 'start': 1.0, 'end': 3.0}, {'text': 'World', 'start': 4.0, 'end': 6.0}]
 
-    video_processing.add_captions_to_video(video_path, segments, output_path)
+    result = video_processing.add_captions_to_video(video_path, segments, output_path)
+
+    assert result == output_path
+    mock_probe.assert_called_once_with(video_path)
+    # A single ffmpeg call burns in all captions; audio is copied untouched
+    mock_subprocess_run.assert_called_once()
+    command_list = mock_subprocess_run.call_args.args[0]
+    assert command_list[0] == 'ffmpeg'
+    assert command_list[command_list.index('-i') + 1] == os.path.abspath(video_path)
+    assert command_list[command_list.index('-vf') + 1] == 'ass=captions.ass'
+    assert command_list[command_list.index('-c:a') + 1] == 'copy'
+    assert command_list[-1] == os.path.abspath(output_path)
+    assert mock_subprocess_run.call_args.kwargs.get('check') is True
+
+    assert "Dialogue: 0,0:00:01.00,0:00:03.00,Caption,,0,0,0,,Hello" in written_captions[0]
+    assert "Dialogue: 0,0:00:04.00,0:00:06.00,Caption,,0,0,0,,World" in written_captions[0]
+
+
+@patch('clipify.core.video_processing._probe_video')
+@patch('subprocess.run')
+def test_add_captions_to_video_with_known_frame_size(mock_subprocess_run, mock_probe, tmp_path):
+    mock_subprocess_run.return_value = MagicMock(returncode=0)
+    video_path = str(tmp_path / "input.mp4")
+    output_path = str(tmp_path / "captioned_video.mp4")
+
+    result = video_processing.add_captions_to_video(
+        video_path, [{'text': 'Hello', 'start': 0.0, 'end': 1.0}], output_path, frame_size=(606, 1080)
+    )
+
+    assert result == output_path
+    mock_probe.assert_not_called() # The caller-supplied size is used instead of reopening the file
+
+
+@patch('clipify.core.video_processing._probe_video', return_value=(1280, 720, None))
+@patch('subprocess.run')
+def test_add_captions_to_video_no_valid_segments(mock_subprocess_run, mock_probe, tmp_path):
+    video_path = str(tmp_path / "input.mp4")
+    output_path = str(tmp_path / "captioned_video.mp4")
+
+    result = video_processing.add_captions_to_video(video_path, [{'text': '  ', 'start': 0.0, 'end': 1.0}], output_path)
+
+    assert result is None
+    mock_subprocess_run.assert_not_called()
+
 
-    mock_vfc.assert_called_once_with(video_path)
-    assert mock_text_clip.call_count == 2
+def test_write_ass_captions(tmp_path):
+    ass_path = tmp_path / "captions.ass"
+    segments = [
+        {'text': 'Hello {there}', 'start': 1.0, 'end': 3.25},
+        {'text': '', 'start': 3.5, 'end': 4.0},        # Empty text is skipped
+        {'text': 'Backwards', 'start': 5.0, 'end': 4.0} # Non-positive duration is skipped
+    ]
 
-    # Check call for "Hello"
-    mock_text_clip.assert_any_call('Hello', fontsize=24, font='Arial-Bold', color='white', bg_color='black', stroke_color='black', stroke_width=0.5, method='caption', align='center', size=(mock_video_clip_instance.w * 0.9, None))
-    # Check call for "World"
-    mock_text_clip.assert_any_call('World', fontsize=24, font='Arial-Bold', color='white', bg_color='black', stroke_color='black', stroke_width=0.5, method='caption', align='center', size=(mock_video_clip_instance.w * 0.9, None))
+    count = video_processing._write_ass_captions(segments, str(ass_path), 1080, 1920, fontsize=48, color='#FFCC00')
 
-    for instance in mock_text_instances:
-        instance.set_position.assert_called()
-        instance.set_duration.assert_called()
-        instance.set_start.assert_called()
-        instance.close.assert_called_once() # Check that individual text clips are closed
+    assert count == 1
+    content = ass_path.read_text(encoding='utf-8')
+    assert "PlayResX: 1080" in content
+    assert "PlayResY: 1920" in content
+    # Arial-Bold -> Arial with bold flag, colors in &HAABBGGRR, top-center alignment at 85% of the height
+    assert "Style: Caption,Arial,48,&H0000CCFF,&H0000CCFF,&H00000000,&H00000000,-1,0,0,0,100,100,0,0,3,1,0,8,54,54,1632,1" in content
+    assert "Dialogue: 0,0:00:01.00,0:00:03.25,Caption,,0,0,0,,Hello (there)" in content
+
+
+@patch('clipify.core.video_processing._probe_video', return_value=(1920, 1080, None))
+@patch('subprocess.run')
+def test_render_clip_single_ffmpeg_pass(mock_subprocess_run, mock_probe, tmp_path):
+    written_captions = []
+    def run_side_effect(command, **kwargs):
+        # The caption file only lives for the duration of the ffmpeg call
+        written_captions.append(open(os.path.join(kwargs['cwd'], 'captions.ass'), encoding='utf-8').read())
+        return MagicMock(returncode=0)
+    mock_subprocess_run.side_effect = run_side_effect
+
+    video_file = tmp_path / "source.mp4"
+    output_file = tmp_path / "clips" / "clip.mp4"
+    segments = [{'text': 'Hello', 'start': 0.5, 'end': 2.0}]
+
+    result = video_processing.render_clip(str(video_file), 10.0, 25.0, str(output_file), '9:16', segments)
+
+    assert result == str(output_file)
+    mock_subprocess_run.assert_called_once()
+    command_list = mock_subprocess_run.call_args.args[0]
+    assert command_list[0] == 'ffmpeg'
+    assert '-nostdin' in command_list # Clips are rendered concurrently
+    # Input seeking before -i, with a duration rather than an end time
+    assert command_list.index('-ss') < command_list.index('-i')
+    assert command_list[command_list.index('-ss') + 1] == '10.0'
+    assert command_list[command_list.index('-t') + 1] == '15.0'
+    # int(1080 * 9/16) = 607 rounded down to an even 606, centered horizontally
+    assert command_list[command_list.index('-vf') + 1] == "crop=606:1080:657:0,ass=captions.ass"
+    assert command_list[command_list.index('-c:a') + 1] == 'aac' # Unknown source codec is re-encoded
+    assert command_list[-1] == os.path.abspath(str(output_file))
+    assert "Dialogue: 0,0:00:00.50,0:00:02.00,Caption,,0,0,0,,Hello" in written_captions[0]
+
+
+@patch('clipify.core.video_processing._probe_video', return_value=(1920, 1080, None))
+@patch('subprocess.run')
+def test_render_clip_without_captions_and_failures(mock_subprocess_run, mock_probe, tmp_path):
+    mock_subprocess_run.return_value = MagicMock(returncode=0)
+    video_file = tmp_path / "source.mp4"
+    output_file = str(tmp_path / "clip.mp4")
 
-    # Check that CompositeVideoClip was called with the main video clip and all created text clips
-    mock_composite_clip.assert_called_once_with([mock_video_clip_instance] + mock_text_instances, size=mock_video_clip_instance.size)
+    assert video_processing.render_clip(str(video_file), 0.0, 5.0, output_file, '1:1') == output_file
+    command_list = mock_subprocess_run.call_args.args[0]
+    assert command_list[command_list.index('-vf') + 1] == "crop=1080:1080:420:0"
 
-    # Check that write_videofile was called on the final composite clip
-    mock_final_composite_clip.write_videofile.assert_called_once_with(output_path, codec='libx264', audio_codec='aac', temp_audiofile_path=str(tmp_path))
+    assert video_processing.render_clip(str(video_file), 5.0, 5.0, output_file, '1:1') is None # Empty segment
+    assert video_processing.render_clip(str(video_file), 0.0, 5.0, output_file, 'bad') is None # Invalid ratio
 
-    # Check that all main clips are closed
-    mock_video_clip_instance.close.assert_called_once()
-    mock_final_composite_clip.close.assert_called_once()
+    mock_subprocess_run.side_effect = subprocess.CalledProcessError(returncode=1, cmd="ffmpeg", stderr="ffmpeg error")
+    assert video_processing.render_clip(str(video_file), 0.0, 5.0, output_file, '1:1') is None
+
+
+@patch('clipify.core.video_processing._probe_video', return_value=(1920, 1080, 'aac'))
+@patch('subprocess.run')
+def test_render_clip_copies_aac_audio(mock_subprocess_run, mock_probe, tmp_path):
+    mock_subprocess_run.return_value = MagicMock(returncode=0)
+    video_file = str(tmp_path / "source.mp4")
+
+    assert video_processing.render_clip(video_file, 0.0, 5.0, str(tmp_path / "clip.mp4"), '1:1') is not None
+
+    mock_probe.assert_called_once_with(video_file) # Frame size and audio codec come from a single probe
+    command_list = mock_subprocess_run.call_args.args[0]
+    assert command_list[command_list.index('-c:a') + 1] == 'copy' # No audio re-encode for an AAC source
+
+
+@patch('subprocess.run')
+def test_probe_video(mock_subprocess_run, tmp_path):
+    video_processing._ffprobe_streams.cache_clear()
+    source_file = tmp_path / "source.mp4"
+    source_file.write_bytes(b"video")
+    silent_file = tmp_path / "silent.mp4"
+    silent_file.write_bytes(b"video")
+    try:
+        mock_subprocess_run.return_value = MagicMock(returncode=0, stdout=json.dumps({'streams': [
+            {'codec_type': 'video', 'codec_name': 'h264', 'width': 640, 'height': 360},
+            {'codec_type': 'audio', 'codec_name': 'aac'},
+        ]}))
+        assert video_processing._probe_video(str(source_file)) == (640, 360, 'aac')
+        assert video_processing._probe_video(str(source_file)) == (640, 360, 'aac')
+        mock_subprocess_run.assert_called_once() # Probed once per source file
+        command_list = mock_subprocess_run.call_args.args[0]
+        assert command_list[0] == 'ffprobe'
+        assert command_list[-1] == os.path.abspath(source_file)
+
+        mock_subprocess_run.return_value = MagicMock(returncode=0, stdout=json.dumps({'streams': [
+            {'codec_type': 'video', 'codec_name': 'h264', 'width': 1280, 'height': 720},
+        ]}))
+        assert video_processing._probe_video(str(silent_file)) == (1280, 720, None) # No audio stream
+
+        mock_subprocess_run.reset_mock()
+        mock_subprocess_run.side_effect = subprocess.CalledProcessError(returncode=1, cmd="ffprobe")
+        assert video_processing._probe_video(str(source_file.with_name("corrupt.mp4"))) is None # Missing
+        source_file.with_name("corrupt.mp4").write_bytes(b"not a video")
+        assert video_processing._probe_video(str(source_file.with_name("corrupt.mp4"))) is None
+        assert video_processing._probe_video(str(source_file.with_name("corrupt.mp4"))) is None
+        assert mock_subprocess_run.call_count == 2 # Failed probes are not cached
+    finally:
+        video_processing._ffprobe_streams.cache_clear()
+
+
+@patch('subprocess.run')
+def test_probe_video_reprobes_a_replaced_file(mock_subprocess_run, tmp_path):
+    video_processing._ffprobe_streams.cache_clear()
+    source_file = tmp_path / "source.mp4"
+    source_file.write_bytes(b"video")
+    try:
+        mock_subprocess_run.return_value = MagicMock(returncode=0, stdout=json.dumps({'streams': [
+            {'codec_type': 'video', 'codec_name': 'h264', 'width': 1920, 'height': 1080},
+            {'codec_type': 'audio', 'codec_name': 'aac'},
+        ]}))
+        assert video_processing._probe_video(str(source_file)) == (1920, 1080, 'aac')
+
+        # A different video downloaded to the same path
+        source_file.write_bytes(b"another video")
+        mock_subprocess_run.return_value = MagicMock(returncode=0, stdout=json.dumps({'streams': [
+            {'codec_type': 'video', 'codec_name': 'h264', 'width': 1080, 'height': 1920},
+            {'codec_type': 'audio', 'codec_name': 'opus'},
+        ]}))
+        assert video_processing._probe_video(str(source_file)) == (1080, 1920, 'opus')
+        assert mock_subprocess_run.call_count == 2
+    finally:
+        video_processing._ffprobe_streams.cache_clear()
+
+
+@patch('subprocess.run')
+def test_video_encode_args_prefers_working_hardware_encoder(mock_subprocess_run, monkeypatch):
+    monkeypatch.undo() # Use the real detection instead of the pinned software encoder
+    video_processing._video_encode_args.cache_clear()
+    def run_side_effect(command, **kwargs):
+        if '-encoders' in command:
+            return MagicMock(returncode=0, stdout=" V....D h264_nvenc\n V....D h264_qsv\n V....D libx264\n")
+        if 'h264_nvenc' in command: # Listed, but no NVIDIA GPU present
+            raise subprocess.CalledProcessError(returncode=1, cmd=command)
+        return MagicMock(returncode=0)
+    mock_subprocess_run.side_effect = run_side_effect
+
+    try:
+        assert video_processing._video_encode_args() == video_processing.HARDWARE_ENCODE_ARGS['h264_qsv']
+        video_processing._video_encode_args()
+        assert mock_subprocess_run.call_count == 3 # Detection runs once per process
+    finally:
+        video_processing._video_encode_args.cache_clear()
+
+
+@patch('subprocess.run')
+def test_video_encode_args_falls_back_to_libx264(mock_subprocess_run, monkeypatch):
+    monkeypatch.undo()
+    video_processing._video_encode_args.cache_clear()
+    mock_subprocess_run.return_value = MagicMock(returncode=0, stdout=" V....D libx264\n")
+
+    try:
+        assert video_processing._video_encode_args() == video_processing.X264_ENCODE_ARGS
+    finally:
+        video_processing._video_encode_args.cache_clear()